@@ -4,8 +4,8 @@ import json
 import os
 import sys
 import logging
-import urllib.request
-from urllib.error import HTTPError
+
+from config_client import fetch_config
 
 # Setup logging
 logger = logging.getLogger()
@@ -33,6 +33,8 @@ REPORTING_ALERTS_ARN = os.environ['REPORTING_ALERTS_ARN']
 SCHEDULE_ROLE_ARN = os.environ['SCHEDULE_ROLE_ARN']
 SCHEDULE_GROUP_NAME = os.environ.get('SCHEDULE_GROUP_NAME', 'pn-athena-reporting-alerts')
 PROJECT_NAME = os.environ.get('PROJECT_NAME', 'pn')
+DEFAULT_CRON = 'cron(0 2 * * ? *)'
+GROUP_SCHEDULE_PREFIX = 'group-'
 
 scheduler = boto3.client('scheduler')
 
@@ -41,23 +43,9 @@ def fetch_config_from_git():
     """Fetch query configuration from Git repository"""
     logger.info(f"Fetching config from Git: {CONFIG_GIT_URL}")
     
-    try:
-        with urllib.request.urlopen(CONFIG_GIT_URL, timeout=10) as response:
-            content = response.read().decode('utf-8').strip()
-            
-            if not content:
-                raise ValueError("Git config file is empty")
-            
-            config = json.loads(content)
-            logger.info(f"Successfully fetched config with {len(config.get('queries', {}))} queries")
-            return config
-            
-    except HTTPError as e:
-        if e.code == 404:
-            raise FileNotFoundError(f"Config file not found at {CONFIG_GIT_URL}")
-        raise RuntimeError(f"Failed to fetch config from Git (HTTP {e.code}): {CONFIG_GIT_URL}")
-    except Exception as e:
-        raise RuntimeError(f"Failed to fetch config from Git: {e}")
+    config = fetch_config(CONFIG_GIT_URL)
+    logger.info(f"Successfully fetched config with {len(config.get('queries', {}))} queries")
+    return config
 
 
 def list_existing_schedules():
@@ -114,13 +102,73 @@ def build_schedule_name(query_id):
     return f"{PROJECT_NAME}-{query_id}"
 
 
-def calculate_diff(config_queries, existing_schedules):
+def build_group_schedule_name(schedule_group):
+    """Build schedule name from schedule group"""
+    return f"{PROJECT_NAME}-{GROUP_SCHEDULE_PREFIX}{schedule_group}"
+
+
+def build_desired_schedules(config_queries):
+    """
+    Build the desired schedules from the config
+    
+    Queries sharing a schedule_group are triggered by a single schedule,
+    whose invocation executes them together; the other queries keep one
+    schedule each.
+    
+    Query IDs starting with GROUP_SCHEDULE_PREFIX are rejected: their
+    schedule name could be the one of a group.
+    
+    Returns:
+        Dict schedule name -> {cron, description, input}
+    
+    Raises:
+        ValueError: If a query ID starts with GROUP_SCHEDULE_PREFIX
+    """
+    desired = {}
+    
+    invalid_ids = [query_id for query_id in config_queries if query_id.startswith(GROUP_SCHEDULE_PREFIX)]
+    if invalid_ids:
+        raise ValueError(
+            f"Query IDs {invalid_ids} start with the reserved prefix '{GROUP_SCHEDULE_PREFIX}' "
+            f"used by the schedule group names"
+        )
+    
+    for query_id, query_config in config_queries.items():
+        cron_expression = query_config.get('schedule', query_config.get('cron', DEFAULT_CRON))
+        schedule_group = query_config.get('schedule_group')
+        
+        if not schedule_group:
+            desired[build_schedule_name(query_id)] = {
+                'cron': cron_expression,
+                'description': query_config.get('description', f"Scheduled execution for {query_id}"),
+                'input': {'query_id': query_id}
+            }
+            continue
+        
+        schedule_name = build_group_schedule_name(schedule_group)
+        
+        if schedule_name not in desired:
+            desired[schedule_name] = {
+                'cron': cron_expression,
+                'description': f"Scheduled execution for group {schedule_group}",
+                'input': {'schedule_group': schedule_group}
+            }
+        elif desired[schedule_name]['cron'] != cron_expression:
+            logger.warning(
+                f"Query {query_id} has cron {cron_expression} but group {schedule_group} "
+                f"runs on {desired[schedule_name]['cron']}: the group cron is used"
+            )
+    
+    return desired
+
+
+def calculate_diff(desired_schedules, existing_schedules):
     """
     Calculate diff between desired (config) and actual (schedules) state
     
     Returns:
-        to_create: List of query_ids to create schedules for
-        to_update: List of query_ids with changed cron
+        to_create: List of schedule names to create
+        to_update: List of schedule names with changed cron
         to_delete: List of schedule names to delete
     """
     logger.info("Calculating reconciliation diff")
@@ -129,29 +177,25 @@ def calculate_diff(config_queries, existing_schedules):
     to_update = []
     to_delete = []
     
-    # Build set of expected schedule names from config
-    expected_schedules = {build_schedule_name(qid): qid for qid in config_queries.keys()}
-    
     # Find schedules to create or update
-    for query_id, query_config in config_queries.items():
-        schedule_name = build_schedule_name(query_id)
-        desired_cron = query_config.get('schedule', query_config.get('cron', 'cron(0 2 * * ? *)'))
+    for schedule_name, schedule in desired_schedules.items():
+        desired_cron = schedule['cron']
         
         if schedule_name not in existing_schedules:
             # Schedule doesn't exist -> CREATE
-            to_create.append(query_id)
+            to_create.append(schedule_name)
             logger.info(f"  CREATE: {schedule_name} (cron: {desired_cron})")
         else:
             # Schedule exists -> check if cron changed
             existing_cron = existing_schedules[schedule_name]['cron']
             if existing_cron != desired_cron:
                 # Cron changed -> UPDATE
-                to_update.append(query_id)
+                to_update.append(schedule_name)
                 logger.info(f"  UPDATE: {schedule_name} (cron: {existing_cron} → {desired_cron})")
     
     # Find schedules to delete
     for schedule_name in existing_schedules.keys():
-        if schedule_name not in expected_schedules:
+        if schedule_name not in desired_schedules:
             # Schedule exists but not in config -> DELETE
             to_delete.append(schedule_name)
             logger.info(f"  DELETE: {schedule_name} (removed from config)")
@@ -161,26 +205,22 @@ def calculate_diff(config_queries, existing_schedules):
     return to_create, to_update, to_delete
 
 
-def create_schedule(query_id, query_config):
+def create_schedule(schedule_name, schedule):
     """Create new EventBridge Schedule"""
-    schedule_name = build_schedule_name(query_id)
-    cron_expression = query_config.get('schedule', query_config.get('cron', 'cron(0 2 * * ? *)'))
-    description = query_config.get('description', f"Scheduled execution for {query_id}")
-    
     logger.info(f"Creating schedule: {schedule_name}")
     
     try:
         scheduler.create_schedule(
             GroupName=SCHEDULE_GROUP_NAME,
             Name=schedule_name,
-            Description=description,
-            ScheduleExpression=cron_expression,
+            Description=schedule['description'],
+            ScheduleExpression=schedule['cron'],
             FlexibleTimeWindow={'Mode': 'OFF'},
             State='ENABLED',
             Target={
                 'Arn': REPORTING_ALERTS_ARN,
                 'RoleArn': SCHEDULE_ROLE_ARN,
-                'Input': json.dumps({'query_id': query_id})
+                'Input': json.dumps(schedule['input'])
             }
         )
         logger.info(f"Successfully created schedule: {schedule_name}")
@@ -190,26 +230,22 @@ def create_schedule(query_id, query_config):
         return False
 
 
-def update_schedule(query_id, query_config):
+def update_schedule(schedule_name, schedule):
     """Update existing EventBridge Schedule"""
-    schedule_name = build_schedule_name(query_id)
-    cron_expression = query_config.get('schedule', query_config.get('cron', 'cron(0 2 * * ? *)'))
-    description = query_config.get('description', f"Scheduled execution for {query_id}")
-    
     logger.info(f"Updating schedule: {schedule_name}")
     
     try:
         scheduler.update_schedule(
             GroupName=SCHEDULE_GROUP_NAME,
             Name=schedule_name,
-            Description=description,
-            ScheduleExpression=cron_expression,
+            Description=schedule['description'],
+            ScheduleExpression=schedule['cron'],
             FlexibleTimeWindow={'Mode': 'OFF'},
             State='ENABLED',
             Target={
                 'Arn': REPORTING_ALERTS_ARN,
                 'RoleArn': SCHEDULE_ROLE_ARN,
-                'Input': json.dumps({'query_id': query_id})
+                'Input': json.dumps(schedule['input'])
             }
         )
         logger.info(f"Successfully updated schedule: {schedule_name}")
@@ -257,7 +293,8 @@ def lambda_handler(event, context):
         existing_schedules = list_existing_schedules()
         
         # 3. Calculate diff
-        to_create, to_update, to_delete = calculate_diff(queries, existing_schedules)
+        desired_schedules = build_desired_schedules(queries)
+        to_create, to_update, to_delete = calculate_diff(desired_schedules, existing_schedules)
         
         # 4. Apply changes
         results = {
@@ -268,15 +305,15 @@ def lambda_handler(event, context):
         }
         
         # Create new schedules
-        for query_id in to_create:
-            if create_schedule(query_id, queries[query_id]):
+        for schedule_name in to_create:
+            if create_schedule(schedule_name, desired_schedules[schedule_name]):
                 results['created'] += 1
             else:
                 results['failed'] += 1
         
         # Update existing schedules
-        for query_id in to_update:
-            if update_schedule(query_id, queries[query_id]):
+        for schedule_name in to_update:
+            if update_schedule(schedule_name, desired_schedules[schedule_name]):
                 results['updated'] += 1
             else:
                 results['failed'] += 1
@@ -0,0 +1,233 @@
+"""Athena query runner with adaptive polling, deadline and cancellation"""
+import logging
+import os
+import random
+import threading
+import time
+
+import boto3
+
+logger = logging.getLogger()
+
+athena = boto3.client('athena')
+
+# Each Lambda package ships its own copy of this module: keep them identical.
+ATHENA_POLL_INITIAL_SECONDS = float(os.environ.get('ATHENA_POLL_INITIAL_SECONDS', '0.5'))
+ATHENA_POLL_MAX_SECONDS = float(os.environ.get('ATHENA_POLL_MAX_SECONDS', '10'))
+ATHENA_POLL_BACKOFF_FACTOR = 1.5
+# Time kept free at the end of the invocation to cancel queries and log
+ATHENA_DEADLINE_MARGIN_SECONDS = float(os.environ.get('ATHENA_DEADLINE_MARGIN_SECONDS', '30'))
+
+# BatchGetQueryExecution accepts up to 50 ids per call
+BATCH_GET_LIMIT = 50
+
+TERMINAL_STATES = ('SUCCEEDED', 'FAILED', 'CANCELLED')
+
+# Queries in flight in any thread of the invocation: execution id ->
+# (monotonic time of the round that described it, QueryExecution)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+# One describe round at a time, shared by the threads waiting for it
+_poll_lock = threading.Lock()
+
+
+def compute_deadline(context=None, timeout=None):
+    """
+    Build the monotonic deadline of the Athena queries of an invocation:
+    the earliest between timeout seconds from now and the remaining Lambda
+    time minus ATHENA_DEADLINE_MARGIN_SECONDS
+    Returns None when neither limit is given
+    """
+    limits = []
+
+    if timeout:
+        limits.append(timeout)
+
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        limits.append(context.get_remaining_time_in_millis() / 1000 - ATHENA_DEADLINE_MARGIN_SECONDS)
+
+    if not limits:
+        return None
+
+    return time.monotonic() + max(min(limits), 0)
+
+
+def start_query(query, database, workgroup, output_location):
+    """Start an Athena query and return its execution id"""
+    logger.debug(f"Query: {query}")
+
+    response = athena.start_query_execution(
+        QueryString=query,
+        QueryExecutionContext={'Database': database},
+        ResultConfiguration={'OutputLocation': output_location},
+        WorkGroup=workgroup
+    )
+
+    return response['QueryExecutionId']
+
+
+def get_query_executions(query_execution_ids):
+    """Describe the given queries, with one BatchGetQueryExecution call per 50 ids"""
+    if len(query_execution_ids) == 1:
+        response = athena.get_query_execution(QueryExecutionId=query_execution_ids[0])
+        return [response['QueryExecution']]
+
+    executions = []
+
+    for start in range(0, len(query_execution_ids), BATCH_GET_LIMIT):
+        response = athena.batch_get_query_execution(
+            QueryExecutionIds=query_execution_ids[start:start + BATCH_GET_LIMIT]
+        )
+        # Unprocessed ids are simply polled again on the next round
+        executions.extend(response.get('QueryExecutions', []))
+
+    return executions
+
+
+def poll_query_executions(query_execution_ids, since):
+    """
+    Describe the given queries with a state refreshed after since (monotonic)
+    A round started by another thread after since is reused; otherwise one
+    round describes every query in flight, so concurrent threads share the
+    BatchGetQueryExecution calls instead of polling one query each
+    """
+    with _poll_lock:
+        with _in_flight_lock:
+            for query_execution_id in query_execution_ids:
+                _in_flight.setdefault(query_execution_id, (None, None))
+
+            stale = any(
+                _in_flight[query_execution_id][0] is None or _in_flight[query_execution_id][0] < since
+                for query_execution_id in query_execution_ids
+            )
+            polled_ids = list(_in_flight)
+
+        if stale:
+            polled_at = time.monotonic()
+            executions = get_query_executions(polled_ids)
+
+            with _in_flight_lock:
+                for execution in executions:
+                    if execution['QueryExecutionId'] in _in_flight:
+                        _in_flight[execution['QueryExecutionId']] = (polled_at, execution)
+
+    with _in_flight_lock:
+        return [
+            _in_flight[query_execution_id][1]
+            for query_execution_id in query_execution_ids
+            if query_execution_id in _in_flight
+            and _in_flight[query_execution_id][0] is not None
+            and _in_flight[query_execution_id][0] >= since
+        ]
+
+
+def release_query_executions(query_execution_ids):
+    """Stop polling the given queries"""
+    with _in_flight_lock:
+        for query_execution_id in query_execution_ids:
+            _in_flight.pop(query_execution_id, None)
+
+
+def cancel_queries(query_execution_ids):
+    """Stop the given queries, so they do not keep running after the invocation"""
+    for query_execution_id in query_execution_ids:
+        try:
+            athena.stop_query_execution(QueryExecutionId=query_execution_id)
+            logger.warning(f"Query execution cancelled: {query_execution_id}")
+        except Exception as e:
+            logger.error(f"Failed to cancel query {query_execution_id}: {e}")
+
+
+def run_queries(queries, database, workgroup, deadline=None, max_concurrency=None):
+    """
+    Execute Athena queries and wait for their completion
+
+    Args:
+        queries: Dict name -> (query, output_location)
+        database: Glue database
+        workgroup: Athena workgroup
+        deadline: Monotonic deadline from compute_deadline (optional)
+        max_concurrency: Maximum number of queries in flight (default: all)
+
+    Returns:
+        Dict name -> QueryExecution, in any terminal state
+
+    All in-flight queries are polled together, with exponential backoff and
+    jitter, also with the queries run by other threads (see
+    poll_query_executions). When the deadline is reached the running
+    queries are cancelled and RuntimeError is raised.
+    """
+    waiting = list(queries.items())
+    running = {}
+    started_at = {}
+    executions = {}
+    delay = ATHENA_POLL_INITIAL_SECONDS
+    # States described after this time are fresh for this call
+    polled_since = time.monotonic()
+
+    try:
+        while waiting or running:
+            started = False
+            while waiting and (not max_concurrency or len(running) < max_concurrency):
+                name, (query, output_location) = waiting.pop(0)
+                query_execution_id = start_query(query, database, workgroup, output_location)
+                running[query_execution_id] = name
+                started_at[query_execution_id] = time.monotonic()
+                started = True
+                logger.info(f"Query execution started: {query_execution_id} ({name})")
+
+            # New queries are polled from the shortest delay again
+            if started:
+                delay = ATHENA_POLL_INITIAL_SECONDS
+
+            for execution in poll_query_executions(list(running), polled_since):
+                query_execution_id = execution['QueryExecutionId']
+                status = execution['Status']['State']
+
+                if status in TERMINAL_STATES and query_execution_id in running:
+                    elapsed = time.monotonic() - started_at[query_execution_id]
+                    logger.info(f"Query execution {query_execution_id} finished with status: {status} (elapsed: {elapsed:.1f}s)")
+                    executions[running.pop(query_execution_id)] = execution
+                    release_query_executions([query_execution_id])
+
+            polled_since = time.monotonic()
+
+            if not running and not waiting:
+                break
+
+            sleep_seconds = random.uniform(delay / 2, delay)
+
+            if deadline is not None and time.monotonic() + sleep_seconds >= deadline:
+                raise RuntimeError(
+                    f"Query execution deadline reached with {len(running)} running "
+                    f"and {len(waiting)} pending queries"
+                )
+
+            time.sleep(sleep_seconds)
+            delay = min(delay * ATHENA_POLL_BACKOFF_FACTOR, ATHENA_POLL_MAX_SECONDS)
+
+    except Exception:
+        cancel_queries(list(running))
+        raise
+    finally:
+        release_query_executions(list(running))
+
+    return executions
+
+
+def check_succeeded(execution):
+    """Raise RuntimeError unless the query execution succeeded"""
+    if execution['Status']['State'] != 'SUCCEEDED':
+        reason = execution['Status'].get('StateChangeReason', 'Unknown')
+        raise RuntimeError(f"Query {execution['QueryExecutionId']} failed: {reason}")
+
+    return execution
+
+
+def run_query(query, database, workgroup, output_location, deadline=None):
+    """
+    Execute one Athena query and wait for its completion
+    Returns the QueryExecution description of the succeeded query
+    """
+    executions = run_queries({'query': (query, output_location)}, database, workgroup, deadline)
+    return check_succeeded(executions['query'])
@@ -34,7 +34,17 @@ ATHENA_RESULTS_BUCKET = os.environ['ATHENA_RESULTS_BUCKET']
 ATHENA_DATABASE = os.environ['ATHENA_DATABASE']
 ATHENA_WORKGROUP = os.environ['ATHENA_WORKGROUP']
 MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '10'))
+# Backfill: Athena queries in flight at once and maximum number of dates per request
+BACKFILL_MAX_CONCURRENCY = int(os.environ.get('BACKFILL_MAX_CONCURRENCY', '5'))
+BACKFILL_MAX_DAYS = int(os.environ.get('BACKFILL_MAX_DAYS', '31'))
 ATHENA_QUERY_TIMEOUT_SECONDS = int(os.environ.get('ATHENA_QUERY_TIMEOUT_SECONDS', '600'))
+# 'rows': CSV rebuilt from get_query_results, 'copy': server-side copy of the Athena result file
+CSV_EXPORT_MODE = os.environ.get('CSV_EXPORT_MODE', 'rows')
+# Gzip compression of the CSV written in 'rows' mode (.csv.gz)
+CSV_GZIP = os.environ.get('CSV_GZIP', 'false').lower() == 'true'
+# Query telemetry: CloudWatch EMF namespace and S3 prefix of the daily history
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'AthenaReportingAlerts')
+TELEMETRY_S3_PREFIX = os.environ.get('TELEMETRY_S3_PREFIX', 'athena_query_telemetry')
 
 # Validate required configuration at startup
 if not all([CONFIG_GIT_URL, OUTPUT_S3_BUCKET, ATHENA_RESULTS_BUCKET, ATHENA_DATABASE, ATHENA_WORKGROUP]):
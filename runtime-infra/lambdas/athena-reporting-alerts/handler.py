@@ -1,14 +1,16 @@
 """Main handler orchestrating Athena query execution with export and alerts"""
 import json
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from urllib.error import HTTPError
 
 import os
-from config import logger, setup_logger, CONFIG_GIT_URL, ATHENA_DATABASE, ATHENA_WORKGROUP, ATHENA_QUERY_TIMEOUT_SECONDS
-from services.athena_client import execute_athena_query
-from services.s3_client import export_results_to_csv
+from config import logger, setup_logger, CONFIG_GIT_URL, ATHENA_DATABASE, ATHENA_WORKGROUP, CSV_EXPORT_MODE, CSV_GZIP, MAX_WORKERS, BACKFILL_MAX_CONCURRENCY, BACKFILL_MAX_DAYS
+from config_client import fetch_config
+from athena_runner import compute_deadline
+from services.athena_client import run_athena_query, guard_athena_query, stream_query_rows, get_query_row_count
+from services.s3_client import export_results_to_csv, copy_results_to_csv
 from services.slack_client import send_slack_notification
+from services.metrics_client import QueryTelemetry, publish_query_telemetry
 
 
 def fetch_config_from_git():
@@ -16,24 +18,9 @@ def fetch_config_from_git():
     if not CONFIG_GIT_URL:
         raise ValueError("CONFIG_GIT_URL is required")
     
-    url = CONFIG_GIT_URL
-    logger.info(f"Fetching config from Git: {url}")
+    logger.info(f"Fetching config from Git: {CONFIG_GIT_URL}")
     
-    try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            content = response.read().decode('utf-8').strip()
-            
-            if not content:
-                raise ValueError("Git config file is empty")
-            
-            return json.loads(content)
-            
-    except HTTPError as e:
-        if e.code == 404:
-            raise FileNotFoundError(f"Config file not found at {url}")
-        raise RuntimeError(f"Failed to fetch config from Git (HTTP {e.code}): {url}")
-    except Exception as e:
-        raise RuntimeError(f"Failed to fetch config from Git: {e}")
+    return fetch_config(CONFIG_GIT_URL)
 
 
 def calculate_today():
@@ -61,27 +48,135 @@ def substitute_query_variables(query_template, variables):
     return query
 
 
-def handle_export_mode(query_id, query_config, results, execution_date, execution_timestamp, sns_topic_arn):
+def has_date_variables(query_sql):
+    """Tell whether the query depends on the execution date"""
+    return any(f'{{{key}}}' in query_sql for key in ('YEAR', 'MONTH', 'DAY', 'DATE'))
+
+
+CSV_EXPORT_MODES = ('rows', 'copy')
+
+
+def build_count_query(query_sql):
+    """Wrap a query so that Athena returns its row count only"""
+    query_sql = query_sql.strip().rstrip(';')
+    # Newlines keep a trailing line comment from swallowing the parenthesis
+    return f"SELECT count(*) AS record_count FROM (\n{query_sql}\n)"
+
+
+def alerts_need_rows(query_config):
+    """Tell whether any alert of the query may export its rows to CSV"""
+    return any(alert.get('csv_export', False) for alert in query_config.get('alerts', []))
+
+
+def fetch_query_count(query_sql, deadline, telemetry):
+    """
+    Execute the count form of the query
+    Used by alerts without CSV export, which only compare the row count
+    with their thresholds: Athena returns a single row instead of the result set
+    """
+    query_execution = run_athena_query(
+        query=build_count_query(query_sql),
+        database=ATHENA_DATABASE,
+        workgroup=ATHENA_WORKGROUP,
+        deadline=deadline
+    )
+    telemetry.record_execution(query_execution)
+    
+    with telemetry.stage('result_fetch'):
+        _, rows = stream_query_rows(query_execution['QueryExecutionId'])
+        count_row = next(rows, None)
+    
+    return {
+        'execution': query_execution,
+        'export_mode': None,
+        'record_count': int(count_row[0]) if count_row else 0
+    }
+
+
+def fetch_query_result(query_sql, export_mode, deadline, telemetry):
+    """
+    Execute Athena query and collect what the export and alerts modes need
+    Rows are not fetched here: the count comes from the query statistics and
+    the rows, if ever exported, are streamed from the same execution
+    """
+    query_execution = run_athena_query(
+        query=query_sql,
+        database=ATHENA_DATABASE,
+        workgroup=ATHENA_WORKGROUP,
+        deadline=deadline
+    )
+    telemetry.record_execution(query_execution)
+    
+    with telemetry.stage('result_fetch'):
+        record_count = get_query_row_count(query_execution)
+    
+    return {
+        'execution': query_execution,
+        'export_mode': export_mode,
+        'record_count': record_count
+    }
+
+
+def export_query_result(query_id, query_config, query_result, execution_date, telemetry, alert_name=None):
+    """
+    Export query result to CSV, by server-side copy or by streaming the rows
+    In rows mode the export time includes the result pages fetched while
+    writing, which are also timed as result fetch
+    """
+    with telemetry.stage('csv_export'):
+        # An empty result takes the rows path even in copy mode: the Athena
+        # file would hold the header only, the streamed export a marker line
+        if query_result['export_mode'] == 'copy' and query_result['record_count'] == 0:
+            return export_results_to_csv(
+                query_id=query_id,
+                column_names=[],
+                rows=[],
+                record_count=0,
+                execution_date=execution_date,
+                alert_name=alert_name
+            )
+        
+        if query_result['export_mode'] == 'copy':
+            return copy_results_to_csv(
+                query_id=query_id,
+                output_location=query_result['execution']['ResultConfiguration']['OutputLocation'],
+                record_count=query_result['record_count'],
+                execution_date=execution_date,
+                alert_name=alert_name
+            )
+        
+        column_names, rows = stream_query_rows(query_result['execution']['QueryExecutionId'])
+        
+        return export_results_to_csv(
+            query_id=query_id,
+            column_names=column_names,
+            rows=telemetry.timed_rows(rows),
+            record_count=query_result['record_count'],
+            execution_date=execution_date,
+            alert_name=alert_name,
+            compress=query_config.get('csv_gzip', CSV_GZIP)
+        )
+
+
+def handle_export_mode(query_id, query_config, query_result, execution_date, execution_timestamp, sns_topic_arn, telemetry, notify=True):
     """
     Export mode: always export CSV and send Slack notification
+    With notify=False (backfill) the notification is left to the caller
+    Returns the S3 paths of the exported CSV
     """
     logger.info(f"Handling export mode for query: {query_id}")
     
     # Export CSV to S3
-    csv_export = export_results_to_csv(
-        query_id=query_id,
-        results=results,
-        execution_date=execution_date
-    )
+    csv_export = export_query_result(query_id, query_config, query_result, execution_date, telemetry)
     
     logger.info(f"CSV exported to: {csv_export['s3_path']}")
     
     # Send Slack notification if enabled
-    if query_config.get('slack', {}).get('enabled', False):
+    if notify and query_config.get('slack', {}).get('enabled', False):
         slack_config = query_config['slack']
         message_vars = {
             'date': execution_date,
-            'total_rows': len(results),
+            'total_rows': query_result['record_count'],
             's3_path': csv_export['s3_path'],
             'presigned_url': csv_export['presigned_url'],
             'timestamp': execution_timestamp,
@@ -89,8 +184,11 @@ def handle_export_mode(query_id, query_config, results, execution_date, executio
             'description': query_config.get('description', 'N/A')
         }
         
-        send_slack_notification(slack_config, message_vars, sns_topic_arn, mode='export')
+        with telemetry.stage('notification'):
+            send_slack_notification(slack_config, message_vars, sns_topic_arn, mode='export')
         logger.info(f"Slack notification sent for export: {query_id}")
+    
+    return [csv_export['s3_path']]
 
 
 def evaluate_threshold(record_count, operator, threshold_value):
@@ -113,19 +211,23 @@ def evaluate_threshold(record_count, operator, threshold_value):
     return operators_map[operator](record_count, threshold_value)
 
 
-def handle_alerts_mode(query_id, query_config, results, execution_date, execution_timestamp, sns_topic_arn):
+def handle_alerts_mode(query_id, query_config, query_result, execution_date, execution_timestamp, sns_topic_arn, telemetry, notify=True):
     """
     Alerts mode: evaluate threshold and conditionally notify
     Multiple alerts can be defined per query
+    With notify=False (backfill) the notifications are left to the caller
+    Returns the names of the triggered alerts and the S3 paths of their CSV
     """
     logger.info(f"Handling alerts mode for query: {query_id}")
     
-    record_count = len(results)
+    record_count = query_result['record_count']
     alerts = query_config.get('alerts', [])
+    triggered_alerts = []
+    exports = []
     
     if not alerts:
         logger.warning(f"No alerts defined for query: {query_id}")
-        return
+        return triggered_alerts, exports
     
     for alert in alerts:
         alert_name = alert.get('name', 'unnamed-alert')
@@ -141,20 +243,17 @@ def handle_alerts_mode(query_id, query_config, results, execution_date, executio
         
         if condition_met:
             logger.info(f"Alert '{alert_name}' TRIGGERED: condition {record_count} {operator} {value} is TRUE")
+            triggered_alerts.append(alert_name)
             
             # Export CSV if requested for this alert
             csv_export_result = None
             if csv_export:
-                csv_export_result = export_results_to_csv(
-                    query_id=query_id,
-                    results=results,
-                    execution_date=execution_date,
-                    alert_name=alert_name
-                )
+                csv_export_result = export_query_result(query_id, query_config, query_result, execution_date, telemetry, alert_name)
                 logger.info(f"CSV exported for alert: {csv_export_result['s3_path']}")
+                exports.append(csv_export_result['s3_path'])
             
             # Send Slack notification if enabled
-            if query_config.get('slack', {}).get('enabled', False):
+            if notify and query_config.get('slack', {}).get('enabled', False):
                 slack_config = query_config['slack']
                 message_vars = {
                     'date': execution_date,
@@ -169,49 +268,40 @@ def handle_alerts_mode(query_id, query_config, results, execution_date, executio
                     'description': query_config.get('description', 'N/A')
                 }
                 
-                send_slack_notification(slack_config, message_vars, sns_topic_arn, mode='alert')
+                with telemetry.stage('notification'):
+                    send_slack_notification(slack_config, message_vars, sns_topic_arn, mode='alert')
                 logger.info(f"Slack notification sent for alert: {alert_name}")
         else:
             logger.info(f"Alert '{alert_name}' NOT triggered: condition {record_count} {operator} {value} is FALSE")
+    
+    return triggered_alerts, exports
 
 
-def lambda_handler(event, context):
+def execute_configured_query(query_id, query_config, execution_date, execution_timestamp, sns_topic_arn, deadline, telemetry, notify=True):
     """
-    Main Lambda handler for Athena Query Executor
-    
-    Event structure from EventBridge Scheduler:
-    {
-        "query_id": "daily-notifications-report",
-        "execution_date": "2025-11-04"  # optional, default T-1
-    }
+    Execute one configured query and handle its export or alerts
+    Statistics and stage timings are recorded in telemetry
+    Returns dict with record_count, exports (S3 paths) and triggered_alerts
     """
-    setup_logger(context.aws_request_id)
-    
-    # Extract parameters from event
-    query_id = event.get('query_id')
-    if not query_id:
-        raise ValueError("Missing required parameter: query_id")
-    
-    execution_date = event.get('execution_date') or calculate_today()
-    execution_timestamp = datetime.now(timezone.utc).isoformat()
-    
     logger.info(f"Executing query '{query_id}' for date: {execution_date}")
     
-    # Fetch configuration from Git
-    config = fetch_config_from_git()
+    # Process based on action type
+    action = query_config.get('type', 'export')
     
-    if query_id not in config['queries']:
-        raise ValueError(f"Query '{query_id}' not found in config")
+    if action not in ('export', 'alerts'):
+        raise ValueError(f"Unsupported action type: {action}")
     
-    query_config = config['queries'][query_id]
+    logger.info(f"Query type: {action}")
     
-    logger.info(f"Query type: {query_config.get('type', 'export')}")
+    export_mode = query_config.get('export_mode', CSV_EXPORT_MODE)
+    if export_mode not in CSV_EXPORT_MODES:
+        raise ValueError(f"Unsupported export mode: {export_mode}")
     
     # Get base query
     query_sql = query_config['query']
     
     # Substitute date variables ONLY if present in query
-    if '{YEAR}' in query_sql or '{MONTH}' in query_sql or '{DAY}' in query_sql or '{DATE}' in query_sql:
+    if has_date_variables(query_sql):
         date_vars = build_date_variables(execution_date)
         
         # Add THRESHOLD variable if defined (for alerts mode)
@@ -223,17 +313,267 @@ def lambda_handler(event, context):
     else:
         logger.info(f"No date variables in query - executing as-is")
     
-    logger.info(f"Executing Athena query with {len(results) if 'results' in locals() else 'unknown'} variable substitutions")
+    # Pre-flight: partition predicates and scan budget, before the full execution
+    with telemetry.stage('preflight'):
+        guard_athena_query(query_id, query_sql, query_config, ATHENA_DATABASE, ATHENA_WORKGROUP, deadline)
     
-    # Execute Athena query
-    results = execute_athena_query(
-        query=query_sql,
-        database=ATHENA_DATABASE,
-        workgroup=ATHENA_WORKGROUP,
-        timeout=ATHENA_QUERY_TIMEOUT_SECONDS
-    )
+    # Execute Athena query: alerts without CSV export only need the row count
+    if action == 'alerts' and not alerts_need_rows(query_config):
+        logger.info("No alert exports CSV - executing count query")
+        query_result = fetch_query_count(query_sql, deadline, telemetry)
+    else:
+        query_result = fetch_query_result(query_sql, export_mode, deadline, telemetry)
+    
+    logger.info(f"Query returned {query_result['record_count']} records")
+    
+    triggered_alerts = []
+    
+    if action == 'export':
+        exports = handle_export_mode(
+            query_id, query_config, query_result, execution_date, execution_timestamp, sns_topic_arn, telemetry, notify
+        )
+    else:
+        triggered_alerts, exports = handle_alerts_mode(
+            query_id, query_config, query_result, execution_date, execution_timestamp, sns_topic_arn, telemetry, notify
+        )
+    
+    telemetry.succeeded(query_result['record_count'])
+    logger.info(f"Query '{query_id}' completed successfully")
+    
+    return {
+        'record_count': query_result['record_count'],
+        'exports': exports,
+        'triggered_alerts': triggered_alerts
+    }
+
+
+def resolve_query_ids(event, queries):
+    """
+    Select the queries of the invocation: a single query_id, a list of
+    query_ids, or every query sharing the event schedule_group
+    """
+    if event.get('query_ids'):
+        query_ids = list(event['query_ids'])
+    elif event.get('query_id'):
+        query_ids = [event['query_id']]
+    else:
+        schedule_group = event['schedule_group']
+        query_ids = [
+            query_id for query_id, query_config in queries.items()
+            if query_config.get('schedule_group') == schedule_group
+        ]
+        
+        if not query_ids:
+            raise ValueError(f"No query found in schedule group '{schedule_group}'")
+    
+    for query_id in query_ids:
+        if query_id not in queries:
+            raise ValueError(f"Query '{query_id}' not found in config")
+    
+    return query_ids
+
+
+def execute_queries(query_ids, queries, execution_date, execution_timestamp, sns_topic_arn, deadline, telemetries):
+    """
+    Execute the configured queries, concurrently up to MAX_WORKERS at a time
+    
+    A single query raises on failure. With several queries a failed query
+    does not stop the others and is only logged: the queries that succeeded
+    have already exported and notified, and raising would make the async
+    invocation retry (and notify) them again
+    
+    Returns (dict query_id -> number of records, dict query_id -> error)
+    """
+    if len(query_ids) == 1:
+        query_id = query_ids[0]
+        result = execute_configured_query(
+            query_id, queries[query_id], execution_date, execution_timestamp, sns_topic_arn, deadline, telemetries[query_id]
+        )
+        return {query_id: result['record_count']}, {}
+    
+    logger.info(f"Executing {len(query_ids)} queries with up to {MAX_WORKERS} workers")
+    
+    records = {}
+    failed = {}
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(query_ids))) as executor:
+        futures = {
+            executor.submit(
+                execute_configured_query,
+                query_id, queries[query_id], execution_date, execution_timestamp, sns_topic_arn, deadline, telemetries[query_id]
+            ): query_id
+            for query_id in query_ids
+        }
+        
+        for future in as_completed(futures):
+            query_id = futures[future]
+            
+            try:
+                records[query_id] = future.result()['record_count']
+            except Exception as e:
+                logger.error(f"Query '{query_id}' failed: {e}")
+                failed[query_id] = str(e)
+    
+    if failed:
+        logger.error(f"{len(failed)} of {len(query_ids)} queries failed: {', '.join(sorted(failed))}")
+    
+    return records, failed
+
+
+def build_backfill_dates(start_date, end_date):
+    """Build the list of YYYY-MM-DD dates from start_date to end_date included"""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    
+    if end < start:
+        raise ValueError(f"end_date {end_date} is before start_date {start_date}")
+    
+    days = (end - start).days + 1
+    if days > BACKFILL_MAX_DAYS:
+        raise ValueError(f"Backfill of {days} days exceeds BACKFILL_MAX_DAYS ({BACKFILL_MAX_DAYS})")
+    
+    return [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+
+
+def run_backfill(query_id, query_config, dates, execution_timestamp, sns_topic_arn, deadline, telemetries):
+    """
+    Execute the query for every date, up to BACKFILL_MAX_CONCURRENCY Athena
+    queries at a time, and send one summary notification instead of one per date
+    Each date is exported to its own YYYY/MM/DD path
+    
+    Failed dates are logged and returned, not raised: the other dates have
+    already been exported and summarized, and raising would make the async
+    invocation retry (and notify) all of them again
+    
+    Returns list of per-date results, in date order
+    """
+    logger.info(f"Backfilling query '{query_id}' for {len(dates)} dates with up to {BACKFILL_MAX_CONCURRENCY} concurrent queries")
+    
+    results = {}
+    
+    with ThreadPoolExecutor(max_workers=min(BACKFILL_MAX_CONCURRENCY, len(dates))) as executor:
+        futures = {
+            executor.submit(
+                execute_configured_query,
+                query_id, query_config, execution_date, execution_timestamp, sns_topic_arn, deadline,
+                telemetries[execution_date], False
+            ): execution_date
+            for execution_date in dates
+        }
+        
+        for future in as_completed(futures):
+            execution_date = futures[future]
+            
+            # A failed date does not stop the others
+            try:
+                results[execution_date] = {'execution_date': execution_date, 'status': 'SUCCEEDED', **future.result()}
+            except Exception as e:
+                logger.error(f"Backfill of '{query_id}' failed for {execution_date}: {e}")
+                results[execution_date] = {'execution_date': execution_date, 'status': 'FAILED', 'error': str(e)}
+    
+    date_results = [results[execution_date] for execution_date in dates]
+    
+    if query_config.get('slack', {}).get('enabled', False):
+        message_vars = {
+            'query_id': query_id,
+            'description': query_config.get('description', 'N/A'),
+            'start_date': dates[0],
+            'end_date': dates[-1],
+            'results': date_results,
+            'timestamp': execution_timestamp
+        }
+        
+        send_slack_notification(query_config['slack'], message_vars, sns_topic_arn, mode='backfill')
+        logger.info(f"Slack backfill summary sent for: {query_id}")
+    
+    failed = [result['execution_date'] for result in date_results if result['status'] == 'FAILED']
+    if failed:
+        logger.error(f"Backfill of '{query_id}' failed for {len(failed)} of {len(dates)} dates: {', '.join(failed)}")
+    
+    return date_results
+
+
+def handle_backfill(event, config, execution_timestamp, sns_topic_arn, deadline):
+    """
+    Backfill request: {"query_id", "start_date", "end_date"}
+    """
+    if not event.get('query_id') or event.get('query_ids') or event.get('schedule_group'):
+        raise ValueError("Backfill requires a single query_id")
+    
+    if not (event.get('start_date') and event.get('end_date')):
+        raise ValueError("Backfill requires start_date and end_date")
+    
+    query_id = resolve_query_ids(event, config['queries'])[0]
+    query_config = config['queries'][query_id]
+    
+    # Without date variables every date would run the same query
+    if not has_date_variables(query_config['query']):
+        raise ValueError(f"Query '{query_id}' has no date variables, backfill is not supported")
     
-    logger.info(f"Query returned {len(results)} records")
+    dates = build_backfill_dates(event['start_date'], event['end_date'])
+    
+    telemetries = {
+        execution_date: QueryTelemetry(query_id, ATHENA_WORKGROUP, execution_date)
+        for execution_date in dates
+    }
+    
+    try:
+        date_results = run_backfill(query_id, query_config, dates, execution_timestamp, sns_topic_arn, deadline, telemetries)
+    finally:
+        publish_query_telemetry(telemetries.values())
+    
+    succeeded = [result for result in date_results if result['status'] == 'SUCCEEDED']
+    
+    return {
+        'statusCode': 200,
+        'message': f'Backfill of {query_id} executed successfully for {len(succeeded)} of {len(dates)} dates',
+        'dates': [
+            {'execution_date': result['execution_date'], 'records': result['record_count']}
+            for result in succeeded
+        ],
+        'failed': [
+            {'execution_date': result['execution_date'], 'error': result['error']}
+            for result in date_results if result['status'] == 'FAILED'
+        ],
+        'start_date': dates[0],
+        'end_date': dates[-1]
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for Athena Query Executor
+    
+    Event structure from EventBridge Scheduler:
+    {
+        "query_id": "daily-notifications-report",
+        "execution_date": "2025-11-04"  # optional, default T-1
+    }
+    
+    "query_id" can be replaced by "query_ids" (list of query ids) or by
+    "schedule_group" (every query of the group): the queries are then
+    executed concurrently, up to MAX_WORKERS at a time
+    
+    "start_date" and "end_date" instead of "execution_date" backfill the
+    query for every date of the range (see handle_backfill)
+    """
+    setup_logger(context.aws_request_id)
+    
+    # Invocation deadline: every query also gets its own
+    # ATHENA_QUERY_TIMEOUT_SECONDS, within this bound
+    deadline = compute_deadline(context)
+    
+    # Extract parameters from event
+    if not any(event.get(key) for key in ('query_id', 'query_ids', 'schedule_group')):
+        raise ValueError("Missing required parameter: query_id")
+    
+    execution_date = event.get('execution_date') or calculate_today()
+    execution_timestamp = datetime.now(timezone.utc).isoformat()
+    
+    # Fetch configuration from Git
+    config = fetch_config_from_git()
+    
+    query_ids = resolve_query_ids(event, config['queries'])
     
     # Get SNS Topic ARN from environment (single topic for all notifications)
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
@@ -241,21 +581,42 @@ def lambda_handler(event, context):
     if not sns_topic_arn:
         logger.warning("SNS_TOPIC_ARN not configured in environment")
     
-    # Process based on action type
-    action = query_config.get('type', 'export')
+    if event.get('start_date') or event.get('end_date'):
+        return handle_backfill(event, config, execution_timestamp, sns_topic_arn, deadline)
     
-    if action == 'export':
-        handle_export_mode(query_id, query_config, results, execution_date, execution_timestamp, sns_topic_arn)
-    elif action == 'alerts':
-        handle_alerts_mode(query_id, query_config, results, execution_date, execution_timestamp, sns_topic_arn)
-    else:
-        raise ValueError(f"Unsupported action type: {action}")
+    telemetries = {
+        query_id: QueryTelemetry(query_id, ATHENA_WORKGROUP, execution_date)
+        for query_id in query_ids
+    }
     
-    logger.info(f"Query '{query_id}' completed successfully")
+    # Metrics and history are published for failed queries too
+    try:
+        records, failed = execute_queries(
+            query_ids, config['queries'], execution_date, execution_timestamp, sns_topic_arn, deadline, telemetries
+        )
+    finally:
+        publish_query_telemetry(telemetries.values())
+    
+    if len(query_ids) == 1:
+        query_id = query_ids[0]
+        
+        return {
+            'statusCode': 200,
+            'message': f'Query {query_id} executed successfully',
+            'records': records[query_id],
+            'execution_date': execution_date
+        }
     
     return {
         'statusCode': 200,
-        'message': f'Query {query_id} executed successfully',
-        'records': len(results),
+        'message': f'{len(records)} of {len(query_ids)} queries executed successfully',
+        'queries': [
+            {'query_id': query_id, 'records': records[query_id]}
+            for query_id in query_ids if query_id in records
+        ],
+        'failed': [
+            {'query_id': query_id, 'error': failed[query_id]}
+            for query_id in query_ids if query_id in failed
+        ],
         'execution_date': execution_date
     }
@@ -1,96 +1,138 @@
 """Athena service layer"""
 import boto3
-import time
-from config import logger, ATHENA_RESULTS_BUCKET
+import csv
+import io
+from athena_runner import compute_deadline, run_query
+from query_guard import guard_queries
+from config import logger, ATHENA_RESULTS_BUCKET, ATHENA_QUERY_TIMEOUT_SECONDS
 
 athena = boto3.client('athena')
+s3 = boto3.client('s3')
 
 
-def execute_athena_query(query, database, workgroup, timeout):
+def query_deadline(deadline=None):
+    """
+    Deadline of one Athena query: ATHENA_QUERY_TIMEOUT_SECONDS from now,
+    bounded by the invocation deadline
+    """
+    timeout_deadline = compute_deadline(timeout=ATHENA_QUERY_TIMEOUT_SECONDS)
+    
+    if timeout_deadline is None:
+        return deadline
+    if deadline is None:
+        return timeout_deadline
+    
+    return min(deadline, timeout_deadline)
+
+
+def run_athena_query(query, database, workgroup, deadline=None):
     """
     Execute Athena query and wait for completion
-    Returns list of result rows as dictionaries
+    Returns the QueryExecution description of the succeeded query
     """
     logger.info(f"Starting Athena query execution in database: {database}")
-    logger.debug(f"Query: {query}")
     
-    # Start query execution
-    response = athena.start_query_execution(
-        QueryString=query,
-        QueryExecutionContext={'Database': database},
-        ResultConfiguration={'OutputLocation': f"s3://{ATHENA_RESULTS_BUCKET}/query_results/"},
-        WorkGroup=workgroup
+    return run_query(
+        query=query,
+        database=database,
+        workgroup=workgroup,
+        output_location=f"s3://{ATHENA_RESULTS_BUCKET}/query_results/",
+        deadline=query_deadline(deadline)
     )
-    query_execution_id = response['QueryExecutionId']
-    
-    logger.info(f"Query execution started: {query_execution_id}")
+
+
+def guard_athena_query(name, query, query_config, database, workgroup, deadline=None):
+    """
+    Pre-flight check of a query before its full execution: partition
+    predicates and max_scanned_bytes budget, from an EXPLAIN (TYPE IO)
+    Raises ValueError when the query is rejected
+    """
+    guard_queries(
+        {name: (query, query_config)},
+        database=database,
+        workgroup=workgroup,
+        output_location=f"s3://{ATHENA_RESULTS_BUCKET}/query_results/",
+        deadline=query_deadline(deadline)
+    )
+
+
+def stream_query_rows(query_execution_id):
+    """
+    Page through the results of a succeeded query
+    Returns the column names and a generator of rows as tuples: pages are
+    fetched while the rows are consumed, so memory does not grow with the
+    result size
+    """
+    response = athena.get_query_results(QueryExecutionId=query_execution_id)
+    column_info = response['ResultSet'].get('ResultSetMetadata', {}).get('ColumnInfo', [])
+    column_names = tuple(col['Name'] for col in column_info)
     
-    # Wait for query completion
-    start_time = time.time()
-    while True:
-        execution = athena.get_query_execution(QueryExecutionId=query_execution_id)
-        status = execution['QueryExecution']['Status']['State']
-        
-        if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-            break
-        
-        # Check timeout
-        if time.time() - start_time > timeout:
-            raise RuntimeError(f"Query execution timeout after {timeout} seconds")
+    def generate_rows(response):
+        # The first row of the first page is the header
+        rows = response['ResultSet']['Rows'][1:]
         
-        time.sleep(2)
-    
-    elapsed = time.time() - start_time
-    logger.info(f"Query execution finished with status: {status} (elapsed: {elapsed:.1f}s)")
-    
-    if status != 'SUCCEEDED':
-        reason = execution['QueryExecution']['Status'].get('StateChangeReason', 'Unknown')
-        raise RuntimeError(f"Query {query_execution_id} failed: {reason}")
-    
-    # Get query results
-    results = []
-    next_token = None
-    
-    while True:
-        if next_token:
+        while True:
+            for row in rows:
+                yield tuple(col.get('VarCharValue', '') for col in row['Data'])
+            
+            # Check for more results
+            next_token = response.get('NextToken')
+            if not next_token:
+                return
+            
             response = athena.get_query_results(
                 QueryExecutionId=query_execution_id,
                 NextToken=next_token
             )
-        else:
-            response = athena.get_query_results(QueryExecutionId=query_execution_id)
-        
-        result_set = response['ResultSet']
-        rows = result_set['Rows']
-        
-        # Extract column names from first row (header)
-        if not results and rows:
-            column_info = result_set.get('ResultSetMetadata', {}).get('ColumnInfo', [])
-            column_names = [col['Name'] for col in column_info]
-            
-            # Skip header row, process data rows
-            for row in rows[1:]:
-                row_dict = {}
-                for idx, col in enumerate(row['Data']):
-                    col_name = column_names[idx] if idx < len(column_names) else f'col_{idx}'
-                    row_dict[col_name] = col.get('VarCharValue', '')
-                results.append(row_dict)
-        else:
-            # For subsequent pages, all rows are data
-            column_info = result_set.get('ResultSetMetadata', {}).get('ColumnInfo', [])
-            column_names = [col['Name'] for col in column_info]
-            
-            for row in rows:
-                row_dict = {}
-                for idx, col in enumerate(row['Data']):
-                    col_name = column_names[idx] if idx < len(column_names) else f'col_{idx}'
-                    row_dict[col_name] = col.get('VarCharValue', '')
-                results.append(row_dict)
+            rows = response['ResultSet']['Rows']
+    
+    return column_names, generate_rows(response)
+
+
+def split_s3_location(location):
+    """Split an s3://bucket/key location into bucket and key"""
+    bucket, _, key = location[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def count_result_file_rows(output_location):
+    """
+    Count the data rows of the CSV result file written by Athena
+    The file is streamed through csv.reader, so quoted values spanning
+    several lines are counted once and memory does not grow with the file
+    """
+    bucket, key = split_s3_location(output_location)
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    
+    try:
+        rows = sum(1 for _ in csv.reader(io.TextIOWrapper(body, encoding='utf-8', newline='')))
+    finally:
+        body.close()
+    
+    # The first row is the header
+    return max(rows - 1, 0)
+
+
+def get_query_row_count(query_execution):
+    """
+    Return the number of rows produced by a succeeded query
+    Read from the query runtime statistics, falling back to a streamed
+    count of the result file when the statistics are not available
+    """
+    query_execution_id = query_execution['QueryExecutionId']
+    
+    try:
+        response = athena.get_query_runtime_statistics(QueryExecutionId=query_execution_id)
+        output_rows = response['QueryRuntimeStatistics'].get('Rows', {}).get('OutputRows')
         
-        # Check for more results
-        next_token = response.get('NextToken')
-        if not next_token:
-            break
+        if output_rows is not None:
+            logger.info(f"Query {query_execution_id} returned {output_rows} rows (runtime statistics)")
+            return int(output_rows)
+    except Exception as e:
+        logger.warning(f"Runtime statistics not available for query {query_execution_id}: {e}")
+    
+    output_location = query_execution['ResultConfiguration']['OutputLocation']
+    record_count = count_result_file_rows(output_location)
     
-    logger.info(f"Retrieved {len(results)} result rows")
-    return results
+    logger.info(f"Query {query_execution_id} returned {record_count} rows (result file count)")
+    return record_count
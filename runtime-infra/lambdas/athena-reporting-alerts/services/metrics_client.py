@@ -0,0 +1,220 @@
+"""Query telemetry service layer - CloudWatch EMF metrics and daily S3 history"""
+import boto3
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from config import logger, OUTPUT_S3_BUCKET, TELEMETRY_S3_PREFIX, METRICS_NAMESPACE
+
+s3 = boto3.client('s3')
+
+# QueryExecution.Statistics field -> metric name
+ATHENA_STATISTICS_METRICS = {
+    'QueryQueueTimeInMillis': 'QueueTime',
+    'QueryPlanningTimeInMillis': 'PlanningTime',
+    'EngineExecutionTimeInMillis': 'EngineExecutionTime',
+    'ServiceProcessingTimeInMillis': 'ServiceProcessingTime',
+    'TotalExecutionTimeInMillis': 'TotalExecutionTime',
+    'DataScannedInBytes': 'DataScannedInBytes'
+}
+
+# Stage timer -> metric name
+STAGE_METRICS = {
+    'preflight': 'PreflightTime',
+    'result_fetch': 'ResultFetchTime',
+    'csv_export': 'CsvExportTime',
+    'notification': 'NotificationTime'
+}
+
+# Conditional writes of the history object are retried on concurrent updates
+HISTORY_WRITE_ATTEMPTS = 5
+
+# Without s3:ListBucket S3 reports a missing key as AccessDenied
+MISSING_KEY_ERRORS = ('NoSuchKey', 'AccessDenied')
+
+
+class QueryTelemetry:
+    """Athena statistics and stage timings of one configured query execution"""
+
+    def __init__(self, query_id, workgroup, execution_date):
+        self.query_id = query_id
+        self.workgroup = workgroup
+        self.execution_date = execution_date
+        self.query_execution_id = None
+        self.statistics = {}
+        self.timings = {}
+        self.record_count = None
+        # Stays FAILED unless the query reaches succeeded()
+        self.status = 'FAILED'
+        self.started_at = time.monotonic()
+
+    def record_execution(self, query_execution):
+        """Keep the statistics Athena reports for the query execution"""
+        self.query_execution_id = query_execution['QueryExecutionId']
+        statistics = query_execution.get('Statistics', {})
+
+        for field, metric in ATHENA_STATISTICS_METRICS.items():
+            if field in statistics:
+                self.statistics[metric] = statistics[field]
+
+    def add_time(self, stage, seconds):
+        """Add seconds to a stage: repeated stages, e.g. several notifications, add up"""
+        self.timings[stage] = self.timings.get(stage, 0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        """Time the enclosed block as the given stage"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.monotonic() - start)
+
+    def timed_rows(self, rows):
+        """Wrap a row generator, timing the result pages fetched while it is consumed"""
+        while True:
+            start = time.monotonic()
+            row = next(rows, None)
+            self.add_time('result_fetch', time.monotonic() - start)
+
+            if row is None:
+                return
+
+            yield row
+
+    def succeeded(self, record_count):
+        """Mark the query as completed with its record count"""
+        self.status = 'SUCCEEDED'
+        self.record_count = record_count
+
+    def metrics(self):
+        """Return metric name -> value, times in milliseconds"""
+        metrics = dict(self.statistics)
+
+        for stage, metric in STAGE_METRICS.items():
+            if stage in self.timings:
+                metrics[metric] = round(self.timings[stage] * 1000)
+
+        metrics['ElapsedTime'] = round((time.monotonic() - self.started_at) * 1000)
+
+        if self.record_count is not None:
+            metrics['RecordCount'] = self.record_count
+
+        return metrics
+
+
+def metric_unit(metric):
+    """CloudWatch unit of a metric"""
+    if metric == 'DataScannedInBytes':
+        return 'Bytes'
+    if metric == 'RecordCount':
+        return 'Count'
+    return 'Milliseconds'
+
+
+def emit_metrics(telemetry, metrics):
+    """
+    Write the metrics of a query as a CloudWatch Embedded Metric Format line
+    CloudWatch Logs extracts them per QueryId and WorkGroup, without any
+    PutMetricData call
+    """
+    document = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['QueryId', 'WorkGroup']],
+                'Metrics': [{'Name': name, 'Unit': metric_unit(name)} for name in metrics]
+            }]
+        },
+        'QueryId': telemetry.query_id,
+        'WorkGroup': telemetry.workgroup,
+        'QueryExecutionId': telemetry.query_execution_id,
+        'Status': telemetry.status,
+        **metrics
+    }
+
+    # EMF lines must be plain JSON, so they bypass the log formatter.
+    # A single write keeps lines from concurrent queries apart.
+    sys.stdout.write(json.dumps(document) + '\n')
+    sys.stdout.flush()
+
+
+def build_history_key(run_date):
+    """Build S3 key: prefix/YYYY/MM/DD/history.jsonl"""
+    return f"{TELEMETRY_S3_PREFIX}/{run_date.strftime('%Y/%m/%d')}/history.jsonl"
+
+
+def append_history(records, run_date):
+    """
+    Append telemetry records, one JSON line each, to the daily history object
+    S3 objects cannot be appended to: the object is read and written back
+    with a conditional PutObject, retried when another invocation updated it
+    in the meantime
+    An object that cannot be read is created with IfNoneMatch: if it exists
+    after all, the write fails instead of overwriting it
+    """
+    s3_key = build_history_key(run_date)
+    lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode('utf-8')
+
+    for attempt in range(1, HISTORY_WRITE_ATTEMPTS + 1):
+        try:
+            response = s3.get_object(Bucket=OUTPUT_S3_BUCKET, Key=s3_key)
+            body = response['Body'].read()
+            condition = {'IfMatch': response['ETag']}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in MISSING_KEY_ERRORS:
+                raise
+            body = b''
+            condition = {'IfNoneMatch': '*'}
+
+        try:
+            s3.put_object(
+                Bucket=OUTPUT_S3_BUCKET,
+                Key=s3_key,
+                Body=body + lines,
+                ContentType='application/x-ndjson',
+                **condition
+            )
+            logger.info(f"Telemetry of {len(records)} queries appended to s3://{OUTPUT_S3_BUCKET}/{s3_key}")
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+            logger.info(f"Telemetry history updated concurrently, retrying (attempt {attempt})")
+
+    raise RuntimeError(f"Failed to append telemetry history after {HISTORY_WRITE_ATTEMPTS} attempts")
+
+
+def publish_query_telemetry(telemetries):
+    """
+    Emit the EMF metrics of each query and append them to the daily history
+    Telemetry is best effort: failures are logged and never fail the invocation
+    """
+    now = datetime.now(timezone.utc)
+    records = []
+
+    for telemetry in telemetries:
+        metrics = telemetry.metrics()
+
+        try:
+            emit_metrics(telemetry, metrics)
+        except Exception as e:
+            logger.warning(f"Failed to emit metrics for query {telemetry.query_id}: {e}")
+
+        records.append({
+            'ts': now.isoformat(timespec='seconds'),
+            'query_id': telemetry.query_id,
+            'workgroup': telemetry.workgroup,
+            'execution_date': telemetry.execution_date,
+            'execution_id': telemetry.query_execution_id,
+            'status': telemetry.status,
+            **metrics
+        })
+
+    try:
+        append_history(records, now)
+    except Exception as e:
+        logger.warning(f"Failed to append telemetry history: {e}")
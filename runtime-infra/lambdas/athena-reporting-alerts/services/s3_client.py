@@ -3,7 +3,8 @@ import os
 import boto3
 from botocore.config import Config
 import csv
-from io import StringIO
+import gzip
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from config import logger, OUTPUT_S3_BUCKET, CSV_S3_PREFIX
 
@@ -14,84 +15,291 @@ s3_config = Config(
 )
 s3 = boto3.client('s3', config=s3_config)
 
+# Server-side copy: files above one part are copied with UploadPartCopy
+COPY_PART_SIZE = 256 * 1024 * 1024
+COPY_MAX_CONCURRENCY = 8
 
-def export_results_to_csv(query_id, results, execution_date, alert_name=None):
+# Streaming export: S3 parts are at least 5 MB, except the last one
+CSV_PART_SIZE = 8 * 1024 * 1024
+
+
+def build_csv_key(query_id, execution_date, alert_name=None, extension='.csv'):
+    """Build S3 key: prefix/query_id/YYYY/MM/DD/filename"""
+    if alert_name:
+        filename = f"{query_id}-{alert_name}-{execution_date}{extension}"
+    else:
+        filename = f"{query_id}-{execution_date}{extension}"
+    
+    date_parts = execution_date.split('-')
+    year, month, day = date_parts[0], date_parts[1], date_parts[2]
+    
+    return f"{CSV_S3_PREFIX}/{query_id}/{year}/{month}/{day}/{filename}"
+
+
+def build_export_result(s3_key):
+    """Build S3 path and presigned URL of an exported CSV"""
+    s3_path = f"s3://{OUTPUT_S3_BUCKET}/{s3_key}"
+    
+    # Generate presigned URL
+    presigned_url = s3.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': OUTPUT_S3_BUCKET,
+            'Key': s3_key
+        },
+        ExpiresIn=86400 # 1 day (24 hours)
+    )
+    
+    logger.info(f"CSV exported successfully to: {s3_path}")
+    
+    return {
+        's3_path': s3_path,
+        'presigned_url': presigned_url
+    }
+
+
+class MultipartUploadStream:
+    """
+    Binary stream uploading what is written to S3 in parts of CSV_PART_SIZE,
+    so memory stays bounded by the part size
+    An object smaller than one part is uploaded with a single put_object
     """
-    Export query results to CSV on S3
+    
+    def __init__(self, s3_key, content_type, metadata):
+        self.s3_key = s3_key
+        self.content_type = content_type
+        self.metadata = metadata
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+    
+    def write(self, data):
+        self.buffer += data
+        
+        if len(self.buffer) >= CSV_PART_SIZE:
+            self._upload_part()
+        
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def _upload_part(self):
+        if self.upload_id is None:
+            self.upload_id = s3.create_multipart_upload(
+                Bucket=OUTPUT_S3_BUCKET,
+                Key=self.s3_key,
+                ContentType=self.content_type,
+                Metadata=self.metadata
+            )['UploadId']
+        
+        part_number = len(self.parts) + 1
+        response = s3.upload_part(
+            Bucket=OUTPUT_S3_BUCKET,
+            Key=self.s3_key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer)
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.buffer.clear()
+    
+    def close(self):
+        if self.upload_id is None:
+            s3.put_object(
+                Bucket=OUTPUT_S3_BUCKET,
+                Key=self.s3_key,
+                Body=bytes(self.buffer),
+                ContentType=self.content_type,
+                Metadata=self.metadata
+            )
+            return
+        
+        if self.buffer:
+            self._upload_part()
+        
+        s3.complete_multipart_upload(
+            Bucket=OUTPUT_S3_BUCKET,
+            Key=self.s3_key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        logger.info(f"Uploaded {len(self.parts)} parts to: {self.s3_key}")
+    
+    def abort(self):
+        if self.upload_id is not None:
+            s3.abort_multipart_upload(Bucket=OUTPUT_S3_BUCKET, Key=self.s3_key, UploadId=self.upload_id)
+
+
+class TextStream:
+    """Text adapter encoding what csv.writer writes into a binary stream"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write(self, text):
+        return self.stream.write(text.encode('utf-8'))
+
+
+def export_results_to_csv(query_id, column_names, rows, record_count, execution_date, alert_name=None, compress=False):
+    """
+    Export query results to CSV on S3, streaming them in a multipart upload
     
     Args:
         query_id: Query identifier
-        results: List of result rows (list of dicts)
+        column_names: Column names of the result
+        rows: Iterable of result rows (tuples), consumed once
+        record_count: Number of rows, stored in the object metadata
         execution_date: Execution date string (YYYY-MM-DD)
         alert_name: Optional alert name for alerts mode
+        compress: Write a gzip compressed .csv.gz file
     
     Returns:
         Dict with s3_path and presigned_url
     """
-    logger.info(f"Exporting {len(results)} rows to CSV for query: {query_id}")
+    logger.info(f"Exporting {record_count} rows to CSV for query: {query_id}")
     
-    # Build filename automatically
     timestamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
     
-    if alert_name:
-        filename = f"{query_id}-{alert_name}-{execution_date}.csv"
+    # Compressed files are served as gzip archives, not with Content-Encoding:
+    # browsers would otherwise decompress the download behind the .gz name
+    if compress:
+        s3_key = build_csv_key(query_id, execution_date, alert_name, extension='.csv.gz')
+        content_type = 'application/gzip'
     else:
-        filename = f"{query_id}-{execution_date}.csv"
+        s3_key = build_csv_key(query_id, execution_date, alert_name)
+        content_type = 'text/csv'
     
-    # Build S3 path: prefix/query_id/YYYY/MM/DD/filename
-    date_parts = execution_date.split('-')
-    year, month, day = date_parts[0], date_parts[1], date_parts[2]
+    upload = MultipartUploadStream(
+        s3_key,
+        content_type,
+        metadata={
+            'query_id': query_id,
+            'execution_date': execution_date,
+            'record_count': str(record_count),
+            'timestamp': timestamp
+        }
+    )
     
-    s3_key = f"{CSV_S3_PREFIX}/{query_id}/{year}/{month}/{day}/{filename}"
+    try:
+        stream = gzip.GzipFile(fileobj=upload, mode='wb') if compress else upload
+        writer = csv.writer(TextStream(stream))
+        
+        rows = iter(rows)
+        first_row = next(rows, None)
+        
+        if first_row is None:
+            # Empty results, no header either
+            logger.warning(f"No results to export for query: {query_id}")
+            stream.write(b"# No results\n")
+        else:
+            writer.writerow(column_names)
+            writer.writerow(first_row)
+            writer.writerows(rows)
+        
+        # Closing the gzip stream writes its trailer, not the upload
+        if compress:
+            stream.close()
+        
+        upload.close()
+        
+        return build_export_result(s3_key)
+        
+    except Exception as e:
+        upload.abort()
+        logger.error(f"Failed to export CSV to S3: {e}")
+        raise RuntimeError(f"CSV export failed: {e}")
+
+
+def copy_object_multipart(source, s3_key, size, content_type, metadata):
+    """Copy a large object with UploadPartCopy, COPY_PART_SIZE bytes per part"""
+    upload_id = s3.create_multipart_upload(
+        Bucket=OUTPUT_S3_BUCKET,
+        Key=s3_key,
+        ContentType=content_type,
+        Metadata=metadata
+    )['UploadId']
     
-    # Generate CSV content
-    csv_buffer = StringIO()
+    def copy_part(part_number):
+        first_byte = (part_number - 1) * COPY_PART_SIZE
+        last_byte = min(first_byte + COPY_PART_SIZE, size) - 1
+        
+        response = s3.upload_part_copy(
+            Bucket=OUTPUT_S3_BUCKET,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=source,
+            CopySourceRange=f"bytes={first_byte}-{last_byte}"
+        )
+        return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
     
-    if results:
-        # Use keys from first row as headers
-        fieldnames = results[0].keys()
-        writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    else:
-        # Empty results, just write headers if available
-        logger.warning(f"No results to export for query: {query_id}")
-        csv_buffer.write("# No results\n")
+    part_count = (size + COPY_PART_SIZE - 1) // COPY_PART_SIZE
     
-    # Upload to S3
     try:
-        s3.put_object(
+        with ThreadPoolExecutor(max_workers=COPY_MAX_CONCURRENCY) as executor:
+            parts = list(executor.map(copy_part, range(1, part_count + 1)))
+        
+        s3.complete_multipart_upload(
             Bucket=OUTPUT_S3_BUCKET,
             Key=s3_key,
-            Body=csv_buffer.getvalue().encode('utf-8'),
-            ContentType='text/csv',
-            Metadata={
-                'query_id': query_id,
-                'execution_date': execution_date,
-                'record_count': str(len(results)),
-                'timestamp': timestamp
-            }
-        )
-        
-        s3_path = f"s3://{OUTPUT_S3_BUCKET}/{s3_key}"
-        
-        # Generate presigned URL
-        presigned_url = s3.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': OUTPUT_S3_BUCKET,
-                'Key': s3_key
-            },
-            ExpiresIn=86400 # 1 day (24 hours)
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
         )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=OUTPUT_S3_BUCKET, Key=s3_key, UploadId=upload_id)
+        raise
+    
+    logger.info(f"Copied {size} bytes in {part_count} parts")
+
+
+def copy_results_to_csv(query_id, output_location, record_count, execution_date, alert_name=None):
+    """
+    Export query results by copying the CSV written by Athena server-side
+    
+    Args:
+        query_id: Query identifier
+        output_location: s3:// location of the Athena result file
+        record_count: Number of data rows of the result file
+        execution_date: Execution date string (YYYY-MM-DD)
+        alert_name: Optional alert name for alerts mode
+    
+    Returns:
+        Dict with s3_path and presigned_url
+    """
+    logger.info(f"Copying {record_count} rows to CSV for query: {query_id}")
+    
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    s3_key = build_csv_key(query_id, execution_date, alert_name)
+    
+    source_bucket, _, source_key = output_location[len('s3://'):].partition('/')
+    source = {'Bucket': source_bucket, 'Key': source_key}
+    metadata = {
+        'query_id': query_id,
+        'execution_date': execution_date,
+        'record_count': str(record_count),
+        'timestamp': timestamp
+    }
+    
+    try:
+        size = s3.head_object(**source)['ContentLength']
         
-        logger.info(f"CSV exported successfully to: {s3_path}")
+        # CopyObject is a single request up to 5 GB: larger files, and files
+        # spanning several parts, are copied in parallel parts
+        if size > COPY_PART_SIZE:
+            copy_object_multipart(source, s3_key, size, 'text/csv', metadata)
+        else:
+            s3.copy_object(
+                Bucket=OUTPUT_S3_BUCKET,
+                Key=s3_key,
+                CopySource=source,
+                ContentType='text/csv',
+                Metadata=metadata,
+                MetadataDirective='REPLACE'
+            )
         
-        return {
-            's3_path': s3_path,
-            'presigned_url': presigned_url
-        }
+        return build_export_result(s3_key)
         
     except Exception as e:
-        logger.error(f"Failed to export CSV to S3: {e}")
-        raise RuntimeError(f"CSV export failed: {e}")
\ No newline at end of file
+        logger.error(f"Failed to copy CSV to S3: {e}")
+        raise RuntimeError(f"CSV export failed: {e}")
@@ -33,6 +33,35 @@ Matched Records: {alert_count}
 Threshold: {operator} {threshold}{csv_section}"""
 
 
+def build_backfill_message(query_id, start_date, end_date, results):
+    """Build simple plain text summary message for backfill, one line per date"""
+    failed = sum(1 for result in results if result['status'] == 'FAILED')
+    lines = []
+    
+    for result in results:
+        if result['status'] == 'FAILED':
+            lines.append(f"{result['execution_date']}: FAILED")
+            continue
+        
+        line = f"{result['execution_date']}: {result['record_count']} records"
+        if result['triggered_alerts']:
+            line += f" - alerts: {', '.join(result['triggered_alerts'])}"
+        if result['exports']:
+            line += f" - {', '.join(result['exports'])}"
+        lines.append(line)
+    
+    details = '\n'.join(lines)
+    
+    return f"""Athena backfill completed.
+
+Query: {query_id}
+Dates: {start_date} - {end_date}
+Succeeded: {len(results) - failed}
+Failed: {failed}
+
+{details}"""
+
+
 def send_slack_notification(slack_config, message_variables, sns_topic_arn, mode='export'):
     """
     Send Slack notification via SNS with mrkdwn (Slack Markdown) formatting
@@ -41,7 +70,7 @@ def send_slack_notification(slack_config, message_variables, sns_topic_arn, mode
         slack_config: Slack configuration dict from query config
         message_variables: Dict of variables for message
         sns_topic_arn: SNS Topic ARN
-        mode: 'export' or 'alert' to determine template
+        mode: 'export', 'alert' or 'backfill' to determine template
     """
     if not slack_config.get('enabled', False):
         logger.info("Slack notifications disabled for this query")
@@ -66,6 +95,11 @@ def send_slack_notification(slack_config, message_variables, sns_topic_arn, mode
             query_id, description, total_rows, s3_path,
             presigned_url, execution_date, timestamp
         )
+    elif mode == 'backfill':
+        message = build_backfill_message(
+            query_id, message_variables.get('start_date'), message_variables.get('end_date'),
+            message_variables.get('results', [])
+        )
     else:  # alert mode
         alert_name = message_variables.get('alert_name', 'Unknown')
         alert_count = message_variables.get('alert_count', 0)
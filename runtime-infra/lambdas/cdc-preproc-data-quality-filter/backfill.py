@@ -0,0 +1,419 @@
+import argparse
+import base64
+import gzip
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+from index import paused_gc, process_records
+from processor.input_loader import warm_up_table_configs
+
+
+S3_SCHEME = "s3://"
+
+DEFAULT_BATCH_SIZE = 500
+
+# Hour partition written by Firehose in the object prefix (yyyy/MM/dd/HH).
+HOUR_PARTITION_PATTERN = re.compile(r"(?:^|/)(\d{4}/\d{2}/\d{2}/\d{2})/")
+
+# Partition written by the preprocessing delivery stream: its output has
+# already been filtered (e.g. without addresshash) and cannot be reprocessed.
+LAYERED_PARTITION_PATTERN = re.compile(r"(?:^|/)TABLE_NAME=[^/]*/")
+
+FAILED_PARTITION = "errors/processing-failed"
+
+COUNTER_NAMES = (
+    "records",
+    "kept",
+    "dropped",
+    "clean",
+    "quarantine",
+    "excluded",
+    "failed",
+    "duplicates",
+    "inputBytes",
+)
+
+
+def is_s3_uri(location):
+    return location.startswith(S3_SCHEME)
+
+
+def split_s3_uri(uri):
+    bucket, _, prefix = uri[len(S3_SCHEME):].partition("/")
+
+    return bucket, prefix
+
+
+def _s3_client():
+    # boto3 is only needed for S3 sources and destinations: local backfills
+    # run with the Lambda requirements alone.
+    import boto3
+
+    return boto3.client("s3")
+
+
+def list_sources(source):
+    if is_s3_uri(source):
+        bucket, prefix = split_s3_uri(source)
+        paginator = _s3_client().get_paginator("list_objects_v2")
+
+        return sorted(
+            f"{S3_SCHEME}{bucket}/{item['Key']}"
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+            for item in page.get("Contents", [])
+            if not item["Key"].endswith("/")
+        )
+
+    source_path = Path(source)
+
+    if source_path.is_file():
+        return [str(source_path)]
+
+    if not source_path.is_dir():
+        raise FileNotFoundError(f"Backfill source not found: {source}")
+
+    return sorted(
+        str(file_path)
+        for file_path in source_path.rglob("*")
+        if file_path.is_file() and not file_path.name.startswith(".")
+    )
+
+
+def output_file_name(source, compress):
+    name = source.rsplit("/", 1)[-1]
+
+    if name.endswith(".gz"):
+        name = name[:-3]
+
+    if not name.endswith(".jsonl"):
+        name = f"{name}.jsonl"
+
+    return f"{name}.gz" if compress else name
+
+
+def hour_partition(source):
+    matches = HOUR_PARTITION_PATTERN.findall(source)
+
+    return matches[-1] if matches else ""
+
+
+@contextmanager
+def open_source(source):
+    compressed = source.endswith(".gz")
+
+    if is_s3_uri(source):
+        bucket, key = split_s3_uri(source)
+        body = _s3_client().get_object(Bucket=bucket, Key=key)["Body"]
+
+        try:
+            if compressed:
+                yield gzip.GzipFile(fileobj=body)
+            else:
+                yield body.iter_lines()
+        finally:
+            body.close()
+
+        return
+
+    opener = gzip.open if compressed else open
+
+    with opener(source, "rb") as stream:
+        yield stream
+
+
+def read_lines(source):
+    with open_source(source) as stream:
+        for line in stream:
+            line = line.rstrip(b"\r\n")
+
+            if line:
+                yield line
+
+
+class PartitionWriter:
+    """
+    Write the records of one source file under the same layout produced by
+    the Firehose dynamic partitioning:
+    <PROCESSING_LAYER>/TABLE_NAME=<TABLE_NAME>/<yyyy/MM/dd/HH>/<file>.
+    """
+
+    def __init__(self, root, file_name, hour, compress):
+        self.root = Path(root)
+        self.file_name = file_name
+        self.hour = hour
+        self.compress = compress
+        self.files = {}
+
+    def _open(self, partition):
+        file_path = self.root / partition / self.hour / self.file_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        opener = gzip.open if self.compress else open
+
+        return opener(file_path, "wb")
+
+    def write(self, partition, data):
+        stream = self.files.get(partition)
+
+        if stream is None:
+            stream = self.files[partition] = self._open(partition)
+
+        stream.write(data)
+        stream.write(b"\n")
+
+    def close(self):
+        for stream in self.files.values():
+            stream.close()
+
+        return [
+            (self.root / partition / self.hour / self.file_name)
+            for partition in self.files
+        ]
+
+
+def record_partition(record):
+    if record["result"] != "Ok":
+        return FAILED_PARTITION
+
+    partition_keys = record["metadata"]["partitionKeys"]
+
+    return (
+        f"{partition_keys['PROCESSING_LAYER']}/"
+        f"TABLE_NAME={partition_keys['TABLE_NAME']}"
+    )
+
+
+def write_batch(batch, writer, totals):
+    with paused_gc():
+        result = process_records(batch)
+
+    for name, value in result.counters.items():
+        totals[name] += value
+
+    for record in result.output:
+        if record["result"] == "Dropped":
+            continue
+
+        writer.write(
+            record_partition(record),
+            base64.b64decode(record["data"]),
+        )
+
+
+def upload_outputs(file_paths, staging_root, output):
+    bucket, prefix = split_s3_uri(output)
+    client = _s3_client()
+
+    for file_path in file_paths:
+        relative_path = file_path.relative_to(staging_root).as_posix()
+        key = f"{prefix.rstrip('/')}/{relative_path}".lstrip("/")
+
+        client.upload_file(str(file_path), bucket, key)
+
+
+def write_source(source, root, batch_size, compress):
+    totals = dict.fromkeys(COUNTER_NAMES, 0)
+
+    writer = PartitionWriter(
+        root=root,
+        file_name=output_file_name(source, compress),
+        hour=hour_partition(source),
+        compress=compress,
+    )
+
+    try:
+        batch = []
+
+        for line_number, line in enumerate(read_lines(source), 1):
+            totals["records"] += 1
+            totals["inputBytes"] += len(line)
+
+            batch.append({
+                "recordId": f"{source}:{line_number}",
+                "data": base64.b64encode(line).decode("ascii"),
+            })
+
+            if len(batch) >= batch_size:
+                write_batch(batch, writer, totals)
+                batch = []
+
+        if batch:
+            write_batch(batch, writer, totals)
+    finally:
+        file_paths = writer.close()
+
+    return totals, file_paths
+
+
+def process_source(source, output, batch_size, compress):
+    if not is_s3_uri(output):
+        totals, _ = write_source(source, output, batch_size, compress)
+
+        return totals
+
+    # S3 outputs are staged locally and uploaded once the file is complete.
+    with tempfile.TemporaryDirectory() as staging_dir:
+        totals, file_paths = write_source(
+            source,
+            staging_dir,
+            batch_size,
+            compress,
+        )
+        upload_outputs(file_paths, Path(staging_dir), output)
+
+    return totals
+
+
+def _check_raw_sources(sources):
+    for source in sources:
+        if LAYERED_PARTITION_PATTERN.search(source):
+            raise ValueError(
+                "Backfill source is the output of the preprocessing "
+                "delivery stream, use the raw CDC stream output instead: "
+                f"{source}"
+            )
+
+
+def _check_output_names(sources, compress):
+    seen = {}
+
+    for source in sources:
+        target = (hour_partition(source), output_file_name(source, compress))
+
+        if target in seen:
+            raise ValueError(
+                "Backfill sources would overwrite the same output file: "
+                f"{seen[target]}, {source}"
+            )
+
+        seen[target] = source
+
+
+def run_backfill(source, output, workers, batch_size, compress):
+    sources = list_sources(source)
+    _check_raw_sources(sources)
+    _check_output_names(sources, compress)
+
+    # Compile every enabled table before starting the pool, so that the
+    # forked workers inherit the plans instead of loading them again.
+    warm_up_table_configs()
+
+    totals = dict.fromkeys(COUNTER_NAMES, 0)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        futures = {
+            executor.submit(
+                process_source,
+                source_file,
+                output,
+                batch_size,
+                compress,
+            ): source_file
+            for source_file in sources
+        }
+
+        for future in as_completed(futures):
+            file_totals = future.result()
+
+            for name, value in file_totals.items():
+                totals[name] += value
+
+            print(
+                f"Source processed. Source={futures[future]}, "
+                f"Records={file_totals['records']}, "
+                f"Failed={file_totals['failed']}"
+            )
+
+    totals["files"] = len(sources)
+    totals["elapsedSeconds"] = time.perf_counter() - started
+
+    return totals
+
+
+def print_report(totals):
+    elapsed = totals["elapsedSeconds"] or 1e-9
+
+    print(
+        "Backfill completed. "
+        f"Files={totals['files']}, "
+        f"Records={totals['records']}, "
+        f"Kept={totals['kept']}, "
+        f"Dropped={totals['dropped']}, "
+        f"Clean={totals['clean']}, "
+        f"Quarantine={totals['quarantine']}, "
+        f"Excluded={totals['excluded']}, "
+        f"Failed={totals['failed']}, "
+        f"Duplicates={totals['duplicates']}, "
+        f"ElapsedSeconds={totals['elapsedSeconds']:.2f}, "
+        f"RecordsPerSecond={totals['records'] / elapsed:.0f}, "
+        f"MegabytesPerSecond={totals['inputBytes'] / elapsed / 1e6:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Reclassify CDC files already delivered by Firehose "
+            "with the current DQ configuration."
+        )
+    )
+    parser.add_argument(
+        "--source",
+        required=True,
+        help=(
+            "Local file or directory, or s3://bucket/prefix, holding the "
+            "raw CDC delivered before the DQ filter"
+        ),
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Local directory or s3://bucket/prefix",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Records per processing batch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Compress the output files",
+    )
+    args = parser.parse_args()
+
+    # Keeps the log lines of concurrent workers whole.
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True, write_through=False)
+
+    totals = run_backfill(
+        source=args.source,
+        output=args.output,
+        workers=max(1, args.workers),
+        batch_size=max(1, args.batch_size),
+        compress=args.gzip,
+    )
+
+    print_report(totals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import index
+from processor.batch_generator import LAYERS, generate_batches
+from processor.input_loader import (
+    get_enabled_table_entry,
+    load_manifest,
+    load_table_config,
+    read_table_config,
+)
+
+
+DEFAULT_MIX = "clean=0.6,quarantine=0.2,excluded=0.1,dropped=0.1"
+
+# Metrics compared against a baseline report, with the direction in which
+# a change is a regression.
+COMPARED_METRICS = (
+    ("recordsPerSecond", "lower"),
+    ("batchLatencyMs.p50", "higher"),
+    ("batchLatencyMs.p99", "higher"),
+    ("memory.peakBytesMax", "higher"),
+)
+
+
+def parse_mix(value):
+    mix = dict.fromkeys(LAYERS, 0.0)
+
+    for item in value.split(","):
+        layer, _, share = item.partition("=")
+        layer = layer.strip()
+
+        if layer not in mix:
+            raise ValueError(f"Unsupported layer in mix: {layer}")
+
+        mix[layer] = float(share)
+
+    return mix
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    position = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+
+    return ordered[position]
+
+
+def summarize_latency(latencies):
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies),
+    }
+
+
+def time_batches(events, iterations):
+    latencies = []
+
+    for _ in range(iterations):
+        for event in events:
+            started = time.perf_counter()
+            index.lambda_handler(event, None)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    return latencies
+
+
+def trace_batches(events):
+    peaks = []
+
+    tracemalloc.start()
+
+    try:
+        for event in events:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            index.lambda_handler(event, None)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return peaks
+
+
+def run_benchmark(args):
+    table_name = args.table or next(iter(load_manifest().get("tables", {})))
+    table_entry = get_enabled_table_entry(table_name)
+
+    if table_entry is None:
+        raise ValueError(f"Table not configured or disabled: {table_name}")
+
+    mix = parse_mix(args.mix)
+
+    events, generated = generate_batches(
+        table_config=read_table_config(table_name, table_entry),
+        plan=load_table_config(table_name),
+        mix=mix,
+        batch_size=args.batch_size,
+        batch_count=args.batches,
+        payload_bytes=args.payload_bytes,
+        seed=args.seed,
+    )
+
+    # The handler logs are not part of the measure.
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        time_batches(events[:1], args.warmup)
+        latencies = time_batches(events, args.iterations)
+        peaks = trace_batches(events)
+
+    record_count = args.batch_size * len(latencies)
+
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "parameters": {
+            "table": table_name,
+            "mix": mix,
+            "batchSize": args.batch_size,
+            "batches": args.batches,
+            "iterations": args.iterations,
+            "payloadBytes": args.payload_bytes,
+            "seed": args.seed,
+            "parallelWorkers": index.PARALLEL_WORKERS,
+        },
+        "generatedRecords": generated,
+        "records": record_count,
+        "recordsPerSecond": record_count / (sum(latencies) / 1000),
+        "batchLatencyMs": summarize_latency(latencies),
+        "memory": {
+            "peakBytesP50": percentile(peaks, 0.50),
+            "peakBytesMax": max(peaks),
+            "peakBytesPerRecord": max(peaks) / args.batch_size,
+        },
+    }
+
+
+def _metric(report, name):
+    value = report
+
+    for key in name.split("."):
+        value = value[key]
+
+    return value
+
+
+def compare_reports(report, baseline, max_regression):
+    regressions = []
+
+    for name, worse in COMPARED_METRICS:
+        current = _metric(report, name)
+        previous = _metric(baseline, name)
+        change = (current - previous) / previous * 100 if previous else 0.0
+
+        if worse == "lower":
+            regression = -change
+        else:
+            regression = change
+
+        print(
+            f"{name}: baseline={previous:.2f}, current={current:.2f}, "
+            f"change={change:+.1f}%"
+        )
+
+        if max_regression is not None and regression > max_regression:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark lambda_handler on synthetic DynamoDB stream "
+            "batches generated from a table configuration."
+        )
+    )
+    parser.add_argument(
+        "--table",
+        help="Configured table (default: first table of the manifest)",
+    )
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help="Share of records per layer (default: %(default)s)",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--payload-bytes",
+        type=int,
+        default=0,
+        help="Approximate size of each record; 0 disables the padding",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        default="benchmark-report.json",
+        help="JSON report path (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Previous JSON report to compare with",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="Fail when a compared metric worsens by more than this percentage",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+    latency = report["batchLatencyMs"]
+
+    print(
+        f"Benchmark completed. Table={report['parameters']['table']}, "
+        f"Records={report['records']}, "
+        f"RecordsPerSecond={report['recordsPerSecond']:.0f}, "
+        f"LatencyP50Ms={latency['p50']:.2f}, "
+        f"LatencyP99Ms={latency['p99']:.2f}, "
+        f"PeakBytesMax={report['memory']['peakBytesMax']}, "
+        f"Report={args.output}"
+    )
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+        regressions = compare_reports(report, baseline, args.max_regression)
+
+        if regressions:
+            print(f"Regression detected: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,103 @@
 import base64
+import gc
 import json
+import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
-from processor.input_loader import load_table_config
-from processor.dq_executor import execute_dq
-from processor.payload_filter import apply_filters
+from processor.input_loader import (
+    CONFIG_WARMUP,
+    load_table_config,
+    warm_up_table_configs,
+)
+from processor.dq_executor import (
+    collect_profile,
+    execute_dq,
+    execute_dq_batch,
+    merge_profile,
+)
+from processor.dq_metrics import (
+    count_record,
+    emit_metrics,
+    emit_profile,
+    merge_metrics,
+    should_log_record,
+)
+from processor.duplicate_index import check_duplicate, duplicate_keys
+from processor.payload_filter import apply_all_filters, apply_filters
+from processor.worker_pool import map_chunks, split_chunks
+
+
+# Opt-in multi-process mode: "auto" uses every available vCPU (Lambda
+# functions get more than one vCPU above 1769 MB of memory).
+_parallel_workers = os.environ.get("PARALLEL_WORKERS", "1").strip().lower()
+
+PARALLEL_WORKERS = (
+    os.cpu_count() or 1
+    if _parallel_workers == "auto"
+    else int(_parallel_workers)
+)
+
+PARALLEL_MIN_RECORDS = int(
+    os.environ.get("PARALLEL_MIN_RECORDS", "2000")
+)
+
+# Opt-in detection of the records replayed within the same batch:
+# "drop" returns them as Dropped, "layer" routes them to DEDUP_LAYER.
+DEDUP_MODE = os.environ.get("DEDUP_MODE", "off").strip().lower()
+
+if DEDUP_MODE not in ("off", "drop", "layer"):
+    raise ValueError(f"Unsupported DEDUP_MODE: {DEDUP_MODE}")
+
+DEDUP_LAYER = os.environ.get("DEDUP_LAYER", "duplicate")
+
+BatchResult = namedtuple(
+    "BatchResult",
+    ["output", "counters", "metrics", "profile", "duplicates"],
+)
+
+
+# Loads every enabled table during the Lambda init phase, so the first
+# batch after a scale-out does not pay for the configuration loading.
+if CONFIG_WARMUP:
+    warm_up_table_configs()
+
+
+TABLE_NAME_KEY = b'"tableName"'
+
+TABLE_NAME_PATTERN = re.compile(
+    rb'"tableName"\s*:\s*"([^"\\]*)"'
+)
+
+TABLE_NAME_SNIFF_BYTES = 1024
+
+
+# Finds tableName with a bounded scan of the raw JSON bytes. Returns None
+# when the sniff is ambiguous (key outside the scanned window, escaped or
+# non-string value, repeated key), so the caller falls back to a full parse.
+def sniff_table_name(decoded_data):
+    match = TABLE_NAME_PATTERN.search(
+        decoded_data,
+        0,
+        TABLE_NAME_SNIFF_BYTES,
+    )
 
+    if match is None:
+        return None
 
-def decode_payload(encoded_data):
-    decoded_data = base64.b64decode(
-        encoded_data
-    ).decode("utf-8")
+    if decoded_data.find(TABLE_NAME_KEY) != match.start():
+        return None
+
+    if decoded_data.find(TABLE_NAME_KEY, match.end()) != -1:
+        return None
 
-    return json.loads(decoded_data)
+    return match.group(1).decode("utf-8")
+
+
+def decode_payload(decoded_data):
+    return json.loads(decoded_data.decode("utf-8"))
 
 
 def encode_payload(payload):
@@ -36,14 +121,122 @@ def build_metadata(table_name, processing_layer):
     }
 
 
-def lambda_handler(event, context):
-    records = event.get("records", [])
+def prepare_record(record):
+    original_data = record.get("data")
+    decoded_data = base64.b64decode(original_data)
+    table_name = sniff_table_name(decoded_data)
+    payload = None
 
-    print(
-        "Starting Firehose preprocessing Lambda. "
-        f"Processing {len(records)} records."
-    )
+    # Records of unconfigured or disabled tables are dropped
+    # without decoding the full JSON document.
+    if (
+        table_name is None
+        or load_table_config(table_name) is not None
+    ):
+        payload = decode_payload(decoded_data)
+        table_name = payload.get("tableName")
+
+    return {
+        "recordId": record.get("recordId"),
+        "data": original_data,
+        "tableName": table_name,
+        "payload": payload,
+        "plan": load_table_config(table_name),
+        "dqResult": None,
+        "error": None,
+        "duplicateKeys": (),
+        "duplicate": False,
+    }
+
+
+def mark_duplicates(entries):
+    seen = set()
+
+    for entry in entries:
+        if entry["error"] is not None or entry["plan"] is None:
+            continue
+
+        entry["duplicateKeys"] = duplicate_keys(
+            entry["tableName"],
+            entry["payload"],
+        )
+        entry["duplicate"] = check_duplicate(seen, entry["duplicateKeys"])
+
+
+def evaluate_tables(entries):
+    tables = {}
+
+    for entry in entries:
+        if (
+            entry["error"] is None
+            and entry["plan"] is not None
+            and not entry["duplicate"]
+        ):
+            tables.setdefault(entry["tableName"], []).append(entry)
+
+    for table_entries in tables.values():
+        try:
+            dq_results = execute_dq_batch(
+                payloads=[entry["payload"] for entry in table_entries],
+                plan=table_entries[0]["plan"],
+            )
+        except Exception:
+            # Records of this table are evaluated one by one while
+            # building the output, isolating the failing ones.
+            continue
+
+        for entry, dq_result in zip(table_entries, dq_results):
+            entry["dqResult"] = dq_result
+
+
+# The batch engine keeps every decoded payload alive until the output is
+# built: pausing the cyclic collector avoids repeated full collections over
+# these acyclic JSON trees, which are still freed by reference counting.
+@contextmanager
+def paused_gc():
+    was_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+# Duplicates routed to DEDUP_LAYER are not evaluated: they get the filters
+# of every layer of the table, so the layer never holds a removed field.
+def build_duplicate_output(record_id, data, table_name, payload=None):
+    if DEDUP_MODE == "layer":
+        if payload is None:
+            payload = decode_payload(base64.b64decode(data))
+
+        filtered_payload, modified = apply_all_filters(
+            payload=payload,
+            filters=load_table_config(table_name).filters,
+        )
+
+        if modified:
+            data = encode_payload(filtered_payload)
+
+    return {
+        "recordId": record_id,
+        "result": "Dropped" if DEDUP_MODE == "drop" else "Ok",
+        "data": data,
+        "metadata": build_metadata(
+            table_name=table_name,
+            processing_layer=DEDUP_LAYER,
+        ),
+    }
 
+
+def count_duplicate(counters, metrics, table_name):
+    counters["duplicates"] += 1
+    counters["dropped" if DEDUP_MODE == "drop" else "kept"] += 1
+    count_record(metrics, table_name, DEDUP_LAYER)
+
+
+def process_records(records):
     output = []
 
     counters = {
@@ -53,20 +246,51 @@ def lambda_handler(event, context):
         "quarantine": 0,
         "excluded": 0,
         "failed": 0,
+        "duplicates": 0,
     }
 
+    metrics = {}
+
+    # (position, keys, duplicate, table, layer, DQ result) of the records
+    # checked for duplicates, used to merge the chunks of a parallel batch.
+    duplicates = []
+
+    entries = []
+
     for record in records:
-        record_id = record.get("recordId")
-        original_data = record.get("data")
+        try:
+            entry = prepare_record(record)
+        except Exception as error:
+            entry = {
+                "recordId": record.get("recordId"),
+                "data": record.get("data"),
+                "error": error,
+            }
+
+        entries.append(entry)
+
+    if DEDUP_MODE != "off":
+        mark_duplicates(entries)
+
+    evaluate_tables(entries)
+
+    for position, entry in enumerate(entries):
+        record_id = entry["recordId"]
+        original_data = entry["data"]
+        final_layer = "failed"
+        final_result = None
 
         try:
-            payload = decode_payload(original_data)
-            table_name = payload.get("tableName")
+            if entry["error"] is not None:
+                raise entry["error"]
 
-            table_config = load_table_config(table_name)
+            table_name = entry["tableName"]
+            table_plan = entry["plan"]
+            payload = entry["payload"]
 
-            if table_config is None:
+            if table_plan is None:
                 counters["dropped"] += 1
+                count_record(metrics, table_name, "dropped")
 
                 output.append({
                     "recordId": record_id,
@@ -80,9 +304,22 @@ def lambda_handler(event, context):
 
                 continue
 
-            dq_result = execute_dq(
+            if entry["duplicate"]:
+                duplicate_output = build_duplicate_output(
+                    record_id,
+                    original_data,
+                    table_name,
+                    payload,
+                )
+
+                count_duplicate(counters, metrics, table_name)
+                output.append(duplicate_output)
+
+                continue
+
+            dq_result = entry["dqResult"] or execute_dq(
                 payload=payload,
-                config=table_config,
+                plan=table_plan,
             )
 
             processing_layer = dq_result["processingLayer"]
@@ -102,7 +339,11 @@ def lambda_handler(event, context):
                     f"{processing_layer}"
                 )
 
-            if dq_errors:
+            # Per-record detail is sampled: the batch totals are published
+            # as EMF metrics by the handler.
+            log_detail = should_log_record(record_id)
+
+            if dq_errors and log_detail:
                 print(
                     "Data Quality checks failed. "
                     f"RecordId={record_id}, "
@@ -111,7 +352,7 @@ def lambda_handler(event, context):
                     f"Errors={json.dumps(dq_errors)}"
                 )
 
-            if processing_layer == "excluded":
+            if processing_layer == "excluded" and log_detail:
                 print(
                     "Record excluded. "
                     f"RecordId={record_id}, "
@@ -120,19 +361,30 @@ def lambda_handler(event, context):
                     f"Exclusion={dq_result.get('exclusion')}"
                 )
 
-            filtered_payload = apply_filters(
+            filtered_payload, modified = apply_filters(
                 payload=payload,
                 processing_layer=processing_layer,
-                filters=table_config.get("filters", []),
+                filters=table_plan.filters,
             )
 
+            # Unmodified payloads are returned as received, skipping the
+            # JSON and Base64 re-encoding.
+            if modified:
+                output_data = encode_payload(filtered_payload)
+            else:
+                output_data = original_data
+
             counters["kept"] += 1
             counters[processing_layer] += 1
+            count_record(metrics, table_name, processing_layer, dq_result)
+
+            final_layer = processing_layer
+            final_result = dq_result
 
             output.append({
                 "recordId": record_id,
                 "result": "Ok",
-                "data": encode_payload(filtered_payload),
+                "data": output_data,
                 "metadata": build_metadata(
                     table_name=table_name,
                     processing_layer=processing_layer,
@@ -141,6 +393,7 @@ def lambda_handler(event, context):
 
         except Exception as error:
             counters["failed"] += 1
+            count_record(metrics, entry.get("tableName"), "failed")
 
             print(
                 "Technical error during record processing. "
@@ -155,6 +408,147 @@ def lambda_handler(event, context):
                 "data": original_data,
             })
 
+        finally:
+            if entry.get("duplicateKeys"):
+                duplicates.append((
+                    position,
+                    entry["duplicateKeys"],
+                    entry["duplicate"],
+                    entry["tableName"],
+                    final_layer,
+                    final_result,
+                ))
+
+    return BatchResult(
+        output=output,
+        counters=counters,
+        metrics=metrics,
+        profile=collect_profile(),
+        duplicates=duplicates,
+    )
+
+
+def process_records_parallel(records, worker_count, timeout=None):
+    # Compile every enabled table before forking, so that the workers
+    # inherit the plans instead of loading them again. Tables failing to
+    # load are skipped here, and their records fail one by one.
+    warm_up_table_configs()
+
+    output = []
+    counters = {}
+    metrics = {}
+    profile = {}
+    seen = set()
+
+    chunk_results = map_chunks(
+        process_records,
+        split_chunks(records, worker_count),
+        timeout=timeout,
+    )
+
+    for chunk_result in chunk_results:
+        offset = len(output)
+
+        output.extend(chunk_result.output)
+        merge_metrics(metrics, chunk_result.metrics)
+        merge_profile(profile, chunk_result.profile)
+
+        for name, value in chunk_result.counters.items():
+            counters[name] = counters.get(name, 0) + value
+
+        # Duplicates within a chunk are already marked by its worker: the
+        # records replaying a record of a previous chunk are marked here.
+        for (
+            position,
+            keys,
+            duplicate,
+            table_name,
+            processing_layer,
+            dq_result,
+        ) in chunk_result.duplicates:
+            if not check_duplicate(seen, keys) or duplicate:
+                continue
+
+            index = offset + position
+
+            try:
+                duplicate_output = build_duplicate_output(
+                    output[index]["recordId"],
+                    records[index].get("data"),
+                    table_name,
+                )
+            except Exception as error:
+                print(
+                    "Technical error during duplicate filtering. "
+                    f"RecordId={output[index]['recordId']}, "
+                    f"ErrorType={type(error).__name__}, "
+                    f"Error={str(error)}"
+                )
+
+                duplicate_output = {
+                    "recordId": output[index]["recordId"],
+                    "result": "ProcessingFailed",
+                    "data": records[index].get("data"),
+                }
+
+            counters[processing_layer] -= 1
+
+            if processing_layer != "failed":
+                counters["kept"] -= 1
+
+            count_record(
+                metrics,
+                table_name,
+                processing_layer,
+                dq_result,
+                value=-1,
+            )
+            if duplicate_output["result"] == "ProcessingFailed":
+                counters["failed"] += 1
+                count_record(metrics, table_name, "failed")
+            else:
+                count_duplicate(counters, metrics, table_name)
+
+            output[index] = duplicate_output
+
+    return BatchResult(
+        output=output,
+        counters=counters,
+        metrics=metrics,
+        profile=profile,
+        duplicates=[],
+    )
+
+
+# Workers still running after half of the remaining invocation time are
+# stopped, leaving the other half to process their chunks again.
+def worker_timeout(context):
+    if context is None:
+        return None
+
+    return context.get_remaining_time_in_millis() / 2000
+
+
+def lambda_handler(event, context):
+    records = event.get("records", [])
+
+    print(
+        "Starting Firehose preprocessing Lambda. "
+        f"Processing {len(records)} records."
+    )
+
+    with paused_gc():
+        if PARALLEL_WORKERS > 1 and len(records) >= PARALLEL_MIN_RECORDS:
+            result = process_records_parallel(
+                records,
+                PARALLEL_WORKERS,
+                timeout=worker_timeout(context),
+            )
+        else:
+            result = process_records(records)
+
+    counters = result.counters
+
     execution_time = datetime.now(timezone.utc).isoformat()
 
     print(
@@ -164,9 +558,13 @@ def lambda_handler(event, context):
         f"Clean={counters['clean']}, "
         f"Quarantine={counters['quarantine']}, "
         f"Excluded={counters['excluded']}, "
-        f"Failed={counters['failed']}"
+        f"Failed={counters['failed']}, "
+        f"Duplicates={counters['duplicates']}"
     )
 
+    emit_metrics(result.metrics)
+    emit_profile(result.profile)
+
     return {
-        "records": output
-    }
\ No newline at end of file
+        "records": result.output
+    }
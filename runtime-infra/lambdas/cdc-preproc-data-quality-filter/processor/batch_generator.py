@@ -0,0 +1,344 @@
+import base64
+import json
+import random
+import string
+
+try:
+    from re import _parser as regex_parser
+except ImportError:
+    import sre_parse as regex_parser
+
+from processor.dq_executor import execute_dq
+
+
+LAYERS = (
+    "clean",
+    "quarantine",
+    "excluded",
+    "dropped",
+)
+
+DROPPED_TABLE_NAME = "benchmark-unconfigured-table"
+
+PADDING_FIELD = "benchmarkPadding"
+
+TOKEN_ALPHABET = string.ascii_letters + string.digits
+
+MAX_REGEX_REPEAT = 3
+
+
+def random_token(rng, length=8):
+    return "".join(rng.choices(TOKEN_ALPHABET, k=length))
+
+
+def _sample_in(rng, items):
+    # Character classes: the sample is drawn from the literals, ranges and
+    # categories of the class (negated classes fall back to a token char).
+    candidates = []
+
+    for op, value in items:
+        op_name = str(op)
+
+        if op_name == "NEGATE":
+            return rng.choice(TOKEN_ALPHABET)
+
+        if op_name == "LITERAL":
+            candidates.append(chr(value))
+        elif op_name == "RANGE":
+            candidates.append(chr(rng.randint(value[0], value[1])))
+        elif op_name == "CATEGORY":
+            candidates.append(_sample_category(rng, value))
+
+    return rng.choice(candidates) if candidates else ""
+
+
+def _sample_category(rng, category):
+    category_name = str(category)
+
+    if category_name.endswith("_DIGIT"):
+        return rng.choice(string.digits)
+
+    if category_name.endswith("_SPACE"):
+        return " "
+
+    return rng.choice(TOKEN_ALPHABET)
+
+
+def _sample_regex(rng, parsed, output):
+    for op, value in parsed:
+        op_name = str(op)
+
+        if op_name == "LITERAL":
+            output.append(chr(value))
+        elif op_name == "NOT_LITERAL":
+            output.append(rng.choice(TOKEN_ALPHABET.replace(chr(value), "")))
+        elif op_name == "ANY":
+            output.append(rng.choice(TOKEN_ALPHABET))
+        elif op_name == "IN":
+            output.append(_sample_in(rng, value))
+        elif op_name == "CATEGORY":
+            output.append(_sample_category(rng, value))
+        elif op_name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            minimum, maximum, sub_pattern = value
+            count = rng.randint(
+                minimum,
+                min(maximum, minimum + MAX_REGEX_REPEAT),
+            )
+
+            for _ in range(count):
+                _sample_regex(rng, sub_pattern, output)
+        elif op_name in ("SUBPATTERN", "ATOMIC_GROUP"):
+            sub_pattern = value[-1] if isinstance(value, tuple) else value
+            _sample_regex(rng, sub_pattern, output)
+        elif op_name == "BRANCH":
+            _sample_regex(rng, rng.choice(value[1]), output)
+
+        # Anchors, lookarounds and back references produce no characters:
+        # candidates violating them are discarded by the classification.
+
+
+def sample_regex(rng, pattern):
+    output = []
+    _sample_regex(rng, regex_parser.parse(pattern), output)
+
+    return "".join(output)
+
+
+def _rule_candidates(rng, rule):
+    rule_type = rule.get("type") or rule.get("operator")
+
+    if rule_type == "starts_with":
+        return [f"{rule.get('value')}{random_token(rng)}"]
+
+    if rule_type == "starts_with_any":
+        return [
+            f"{prefix}{random_token(rng)}"
+            for prefix in rule.get("values", [])
+        ]
+
+    if rule_type == "allowed_values":
+        return list(rule.get("values", []))
+
+    if rule_type == "matches_regex" and rule.get("pattern"):
+        return [
+            sample_regex(rng, rule["pattern"])
+            for _ in range(4)
+        ]
+
+    return [random_token(rng)]
+
+
+def _config_rules(table_config):
+    yield from table_config.get("exclusions", [])
+
+    for check in table_config.get("checks", []):
+        if check.get("when"):
+            yield check["when"]
+
+        yield from check.get("rules") or [check]
+
+
+def field_candidates(table_config, rng):
+    """
+    Collect, for every field referenced by the configuration, the values
+    able to satisfy or violate its rules: prefixes, allowed values and
+    strings sampled from the regular expressions, plus a random token and
+    a missing value.
+    """
+    candidates = {}
+
+    for rule in _config_rules(table_config):
+        fields = rule.get("fields") or [rule.get("field")]
+
+        for field_name in fields:
+            if not field_name:
+                continue
+
+            field_values = candidates.setdefault(
+                field_name,
+                [None, "", random_token(rng)],
+            )
+
+            for value in _rule_candidates(rng, rule):
+                if value not in field_values:
+                    field_values.append(value)
+
+    return candidates
+
+
+def _to_attribute(value):
+    if isinstance(value, bool):
+        return {"BOOL": value}
+
+    if isinstance(value, (int, float)):
+        return {"N": str(value)}
+
+    return {"S": str(value)}
+
+
+def build_image(candidates, rng):
+    image = {}
+
+    for field_name, values in candidates.items():
+        value = rng.choice(values)
+
+        if value is not None:
+            image[field_name] = _to_attribute(value)
+
+    return image
+
+
+def find_prototypes(table_config, plan, rng, per_layer, max_attempts):
+    """
+    Random search over the candidate values: every image is classified with
+    the compiled plan and kept as a prototype of the layer it reaches.
+    """
+    candidates = field_candidates(table_config, rng)
+    image_name = plan.image_priority[0]
+
+    layers = {
+        plan.clean_status: "clean",
+        plan.quarantine_status: "quarantine",
+        plan.excluded_status: "excluded",
+    }
+
+    prototypes = {layer: [] for layer in LAYERS if layer != "dropped"}
+
+    for _ in range(max_attempts):
+        if all(len(images) >= per_layer for images in prototypes.values()):
+            break
+
+        image = build_image(candidates, rng)
+        payload = {"dynamodb": {image_name: image}}
+        layer = layers[execute_dq(payload, plan)["processingLayer"]]
+
+        if len(prototypes[layer]) < per_layer:
+            prototypes[layer].append(image)
+
+    return prototypes
+
+
+def build_stream_record(table_name, image_name, image, rng, sequence):
+    return {
+        "awsRegion": "eu-south-1",
+        "eventID": f"{random_token(rng, 8)}-{random_token(rng, 4)}",
+        "eventName": "INSERT",
+        "userIdentity": None,
+        "recordFormat": "application/json",
+        "tableName": table_name,
+        "dynamodb": {
+            "ApproximateCreationDateTime": 1700000000000 + sequence,
+            "Keys": dict(list(image.items())[:2]),
+            image_name: image,
+            "SizeBytes": len(json.dumps(image)),
+        },
+        "eventSource": "aws:dynamodb",
+    }
+
+
+def pad_record(record, image_name, payload_bytes):
+    if not payload_bytes:
+        return record
+
+    missing = payload_bytes - len(json.dumps(record, separators=(",", ":")))
+    padding = missing - len(f',"{PADDING_FIELD}":{{"S":""}}')
+
+    if padding > 0:
+        record["dynamodb"][image_name][PADDING_FIELD] = {"S": "x" * padding}
+
+    return record
+
+
+def generate_batches(
+    table_config,
+    plan,
+    mix,
+    batch_size,
+    batch_count,
+    payload_bytes=0,
+    seed=0,
+    per_layer=64,
+    max_attempts=20000,
+):
+    """
+    Build Firehose events of DynamoDB stream records for the table.
+
+    mix maps each layer of LAYERS to its share of the records. Returns the
+    events and the number of generated records per layer.
+    """
+    rng = random.Random(seed)
+
+    prototypes = find_prototypes(
+        table_config,
+        plan,
+        rng,
+        per_layer,
+        max_attempts,
+    )
+
+    for layer, share in mix.items():
+        if share > 0 and layer != "dropped" and not prototypes[layer]:
+            raise ValueError(
+                f"No {layer} record found for table {plan.table} "
+                f"after {max_attempts} attempts"
+            )
+
+    layers = [layer for layer in LAYERS if mix.get(layer, 0) > 0]
+    weights = [mix[layer] for layer in layers]
+
+    if not layers:
+        raise ValueError("The record mix must contain a positive share")
+
+    # Dropped records reuse the images of the configured table.
+    dropped_images = [
+        image
+        for images in prototypes.values()
+        for image in images
+    ] or [{}]
+
+    image_name = plan.image_priority[0]
+    generated = dict.fromkeys(LAYERS, 0)
+    events = []
+    sequence = 0
+
+    for _ in range(batch_count):
+        records = []
+
+        for layer in rng.choices(layers, weights, k=batch_size):
+            sequence += 1
+            generated[layer] += 1
+
+            if layer == "dropped":
+                table_name = DROPPED_TABLE_NAME
+                image = rng.choice(dropped_images)
+            else:
+                table_name = plan.table
+                image = rng.choice(prototypes[layer])
+
+            record = pad_record(
+                build_stream_record(
+                    table_name,
+                    image_name,
+                    dict(image),
+                    rng,
+                    sequence,
+                ),
+                image_name,
+                payload_bytes,
+            )
+
+            data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+            records.append({
+                "recordId": str(sequence),
+                "approximateArrivalTimestamp": 1700000000000 + sequence,
+                "data": base64.b64encode(data).decode("ascii"),
+            })
+
+        events.append({
+            "invocationId": random_token(rng, 16),
+            "region": "eu-south-1",
+            "records": records,
+        })
+
+    return events, generated
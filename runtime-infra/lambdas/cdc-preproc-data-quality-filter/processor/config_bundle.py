@@ -0,0 +1,118 @@
+import argparse
+import json
+from pathlib import Path
+
+from processor import input_loader
+from processor.dq_executor import CHECK_COMPILERS, compile_table_config
+from processor.payload_filter import FILTER_COMPILERS
+
+
+def _validate_rule_type(table_name, rule_name, rule_type):
+    if rule_type not in CHECK_COMPILERS:
+        raise ValueError(
+            f"Unsupported Data Quality rule: {rule_type} "
+            f"(table {table_name}, rule {rule_name})"
+        )
+
+
+def validate_table_config(table_name, table_config):
+    for exclusion in table_config.get("exclusions", []):
+        _validate_rule_type(
+            table_name,
+            exclusion.get("name"),
+            exclusion.get("type"),
+        )
+
+    for check in table_config.get("checks", []):
+        check_name = check.get("name")
+        condition = check.get("when")
+
+        if condition:
+            _validate_rule_type(
+                table_name,
+                check_name,
+                condition.get("operator"),
+            )
+
+        for rule in check.get("rules") or [check]:
+            _validate_rule_type(
+                table_name,
+                check_name,
+                rule.get("type"),
+            )
+
+    for rule in table_config.get("filters", []):
+        if rule.get("type") not in FILTER_COMPILERS:
+            raise ValueError(
+                f"Unsupported payload filter: {rule.get('type')} "
+                f"(table {table_name}, filter {rule.get('name')})"
+            )
+
+    # Compiling the plan validates the regular expressions as well.
+    compile_table_config(table_config)
+
+
+def build_bundle():
+    manifest = input_loader.load_yaml_manifest()
+    tables = {}
+
+    for table_name, table_entry in manifest.get("tables", {}).items():
+        if not table_entry or not table_entry.get("enabled", True):
+            continue
+
+        table_config = input_loader.load_yaml_table_config(
+            table_name,
+            table_entry,
+        )
+
+        validate_table_config(table_name, table_config)
+        tables[table_name] = table_config
+
+    return {
+        "format": input_loader.BUNDLE_FORMAT,
+        "sourceHash": input_loader.config_fingerprint(),
+        "manifest": manifest,
+        "tables": tables,
+    }
+
+
+def write_bundle(bundle, output_path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with output_path.open("w", encoding="utf-8") as file:
+        json.dump(
+            bundle,
+            file,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Build the pre-validated DQ configuration bundle "
+            "from the config/ directory."
+        )
+    )
+    parser.add_argument(
+        "--output",
+        default=str(input_loader.BUNDLE_PATH),
+        help="Bundle destination (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    bundle = build_bundle()
+    output_path = Path(args.output)
+
+    write_bundle(bundle, output_path)
+
+    print(
+        f"Configuration bundle written to {output_path}. "
+        f"Tables={len(bundle['tables'])}"
+    )
+
+
+if __name__ == "__main__":
+    main()
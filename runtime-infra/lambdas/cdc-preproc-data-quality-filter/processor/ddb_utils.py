@@ -39,6 +39,9 @@ def get_image(payload, priority=None):
     return {}, "Missing"
 
 
+DDB_VALUE_TYPE_SET = frozenset(DDB_VALUE_TYPES)
+
+
 def get_value(image, field_name):
     if not isinstance(image, dict):
         return None
@@ -48,6 +51,17 @@ def get_value(image, field_name):
     if not isinstance(attribute, dict):
         return None
 
+    # Well-formed attributes hold a single type descriptor.
+    if len(attribute) == 1:
+        for value_type, value in attribute.items():
+            if value_type not in DDB_VALUE_TYPE_SET:
+                return None
+
+            if value_type == "NULL" and value is True:
+                return None
+
+            return value
+
     if attribute.get("NULL") is True:
         return None
 
@@ -58,9 +72,7 @@ def get_value(image, field_name):
     return None
 
 
-def has_value(image, field_name):
-    value = get_value(image, field_name)
-
+def is_valued(value):
     if value is None:
         return False
 
@@ -70,6 +82,10 @@ def has_value(image, field_name):
     return True
 
 
+def has_value(image, field_name):
+    return is_valued(get_value(image, field_name))
+
+
 def remove_fields(payload, field_names, image_names=None):
     image_names = image_names or [
         "NewImage",
@@ -77,6 +93,7 @@ def remove_fields(payload, field_names, image_names=None):
     ]
 
     dynamodb = get_dynamodb(payload)
+    modified = False
 
     for image_name in image_names:
         image = dynamodb.get(image_name)
@@ -85,6 +102,36 @@ def remove_fields(payload, field_names, image_names=None):
             continue
 
         for field_name in field_names:
-            image.pop(field_name, None)
+            if field_name in image:
+                del image[field_name]
+                modified = True
+
+    return payload, modified
+
+
+def keep_fields(payload, field_names, image_names=None):
+    image_names = image_names or [
+        "NewImage",
+        "OldImage",
+    ]
+
+    dynamodb = get_dynamodb(payload)
+    modified = False
+
+    for image_name in image_names:
+        image = dynamodb.get(image_name)
+
+        if not isinstance(image, dict):
+            continue
+
+        removed_fields = [
+            field_name
+            for field_name in image
+            if field_name not in field_names
+        ]
+
+        for field_name in removed_fields:
+            del image[field_name]
+            modified = True
 
-    return payload
\ No newline at end of file
+    return payload, modified
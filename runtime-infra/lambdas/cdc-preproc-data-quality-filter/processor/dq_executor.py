@@ -1,91 +1,266 @@
+import json
+import os
 import re
+from collections import namedtuple
+from time import perf_counter
 
 from processor.ddb_utils import (
     get_image,
     get_value,
-    has_value,
+    is_valued,
 )
+from processor.payload_filter import compile_filter
 
 
-def _check_required(image, rule):
-    fields = rule.get("fields", [])
+DEFAULT_IMAGE_PRIORITY = (
+    "NewImage",
+    "OldImage",
+    "Keys",
+)
 
-    return bool(fields) and all(
-        has_value(image, field_name)
-        for field_name in fields
-    )
+# Opt-in instrumentation: every compiled rule records its evaluation count
+# and cumulative time per table, check and rule type.
+DQ_PROFILE = os.environ.get("DQ_PROFILE", "false").strip().lower() == "true"
+
+# Minimum number of prefixes per distinct prefix length for which a
+# starts_with_any rule is evaluated with the length buckets.
+PREFIX_BUCKET_MIN_RATIO = 32
+
+# Relative evaluation cost of the rule types: rules of a check are
+# evaluated from the cheapest one. Unlisted types cost 0.
+RULE_COSTS = {
+    "matches_regex": 1,
+}
+
+TablePlan = namedtuple(
+    "TablePlan",
+    [
+        "table",
+        "image_priority",
+        "clean_status",
+        "quarantine_status",
+        "excluded_status",
+        "exclusions",
+        "checks",
+        "filters",
+        "fields",
+    ],
+)
+
+# A compiled rule reads the values of `fields` from the image and passes
+# them, in the same order, to `test`: the same test runs per record and
+# over the flat columns of a batch. `error` describes a configuration
+# error that the test raises only when it is evaluated: a test compiled
+# without `error` never raises.
+CompiledRule = namedtuple(
+    "CompiledRule",
+    ["fields", "test", "rule_type", "error"],
+    defaults=(None, None),
+)
+
+CompiledExclusion = namedtuple(
+    "CompiledExclusion",
+    ["name", "rule"],
+)
+
+CompiledCheck = namedtuple(
+    "CompiledCheck",
+    ["name", "error_code", "condition", "rules"],
+)
+
+
+def _never():
+    return False
+
+
+NEVER = CompiledRule(fields=(), test=_never)
+
+
+def _compile_required(rule):
+    fields = tuple(rule.get("fields") or ())
+
+    if not fields:
+        return NEVER
 
+    def test(*values):
+        return all(map(is_valued, values))
 
-def _check_not_null(image, rule):
-    return has_value(image, rule.get("field"))
+    return CompiledRule(fields=fields, test=test)
 
 
-def _check_starts_with(image, rule):
-    value = get_value(image, rule.get("field"))
+def _compile_not_null(rule):
+    return CompiledRule(
+        fields=(rule.get("field"),),
+        test=is_valued,
+    )
+
+
+def _compile_starts_with(rule):
     prefix = rule.get("value")
 
-    return (
-        isinstance(value, str)
-        and isinstance(prefix, str)
-        and value.startswith(prefix)
+    if not isinstance(prefix, str):
+        return NEVER
+
+    def test(value):
+        return isinstance(value, str) and value.startswith(prefix)
+
+    return CompiledRule(
+        fields=(rule.get("field"),),
+        test=test,
+    )
+
+
+def _bucket_prefixes(prefixes):
+    buckets = {}
+
+    for prefix in prefixes:
+        buckets.setdefault(len(prefix), set()).add(prefix)
+
+    return tuple(
+        (length, frozenset(bucket))
+        for length, bucket in sorted(buckets.items())
     )
 
 
-def _check_starts_with_any(image, rule):
-    value = get_value(image, rule.get("field"))
+def _compile_starts_with_any(rule):
     prefixes = rule.get("values", [])
 
-    return (
-        isinstance(value, str)
-        and bool(prefixes)
-        and value.startswith(tuple(prefixes))
+    if not prefixes:
+        return NEVER
+
+    prefixes = tuple(prefixes)
+
+    buckets = None
+
+    if all(isinstance(prefix, str) for prefix in prefixes):
+        buckets = _bucket_prefixes(prefixes)
+
+    # str.startswith scans the prefixes one by one, while the length
+    # buckets cost one slice and one hash lookup per distinct length:
+    # the buckets pay off only for long lists of prefixes.
+    if (
+        buckets is None
+        or len(prefixes) < PREFIX_BUCKET_MIN_RATIO * len(buckets)
+    ):
+        def test(value):
+            return isinstance(value, str) and value.startswith(prefixes)
+    else:
+        def test(value):
+            if not isinstance(value, str):
+                return False
+
+            value_length = len(value)
+
+            for length, bucket in buckets:
+                if length > value_length:
+                    return False
+
+                if value[:length] in bucket:
+                    return True
+
+            return False
+
+    return CompiledRule(
+        fields=(rule.get("field"),),
+        test=test,
     )
 
 
-def _check_allowed_values(image, rule):
-    value = get_value(image, rule.get("field"))
+def _compile_allowed_values(rule):
+    values = rule.get("values", [])
+    lookup = values
+    error = None
 
-    return value in rule.get("values", [])
+    if isinstance(values, (list, tuple)):
+        try:
+            lookup = frozenset(values)
+        except TypeError:
+            lookup = tuple(values)
+    else:
+        # Membership in a scalar (e.g. a number, or a string tested with a
+        # non-string value) raises TypeError when the rule is evaluated.
+        error = f"Invalid allowed values {values!r}: a list is required"
+
+    def test(value):
+        try:
+            return value in lookup
+        except TypeError:
+            # Unhashable DynamoDB values (lists, maps) cannot be looked
+            # up in the frozenset: fall back to the configured sequence.
+            return value in values
+
+    return CompiledRule(
+        fields=(rule.get("field"),),
+        test=test,
+        error=error,
+    )
 
 
-def _check_matches_regex(image, rule):
-    value = get_value(image, rule.get("field"))
+def _compile_matches_regex(rule):
     pattern = rule.get("pattern")
 
-    return (
-        isinstance(value, str)
-        and isinstance(pattern, str)
-        and re.fullmatch(pattern, value) is not None
+    if not isinstance(pattern, str):
+        return NEVER
+
+    try:
+        fullmatch = re.compile(pattern).fullmatch
+    except re.error as error:
+        # An invalid pattern fails only the records reaching the rule with
+        # a string value, as when the pattern was compiled per evaluation.
+        def failing_test(value):
+            return isinstance(value, str) and re.fullmatch(pattern, value) is not None
+
+        return CompiledRule(
+            fields=(rule.get("field"),),
+            test=failing_test,
+            error=f"Invalid pattern {pattern!r}: {error}",
+        )
+
+    def test(value):
+        return isinstance(value, str) and fullmatch(value) is not None
+
+    return CompiledRule(
+        fields=(rule.get("field"),),
+        test=test,
     )
 
 
-CHECK_HANDLERS = {
-    "required": _check_required,
-    "not_null": _check_not_null,
-    "starts_with": _check_starts_with,
-    "starts_with_any": _check_starts_with_any,
-    "allowed_values": _check_allowed_values,
-    "matches_regex": _check_matches_regex,
+CHECK_COMPILERS = {
+    "required": _compile_required,
+    "not_null": _compile_not_null,
+    "starts_with": _compile_starts_with,
+    "starts_with_any": _compile_starts_with_any,
+    "allowed_values": _compile_allowed_values,
+    "matches_regex": _compile_matches_regex,
 }
 
 
-def execute_rule(image, rule):
+def _compile_unsupported(rule_type):
+    error = f"Unsupported Data Quality rule: {rule_type}"
+
+    def test():
+        raise ValueError(error)
+
+    return CompiledRule(fields=(), test=test, rule_type=rule_type, error=error)
+
+
+def compile_rule(rule):
     rule_type = rule.get("type")
-    handler = CHECK_HANDLERS.get(rule_type)
+    compiler = CHECK_COMPILERS.get(rule_type)
 
-    if handler is None:
-        raise ValueError(
-            f"Unsupported Data Quality rule: {rule_type}"
-        )
+    if compiler is None:
+        # Unknown rules keep failing at evaluation time, so records
+        # routed before reaching them are processed as usual.
+        return _compile_unsupported(rule_type)
 
-    return handler(image, rule)
+    return compiler(rule)._replace(rule_type=rule_type)
 
 
-def matches_condition(image, condition):
+def compile_condition(condition, compiled_conditions=None):
     if not condition:
-        return True
+        return None
 
-    condition_rule = {
+    rule = {
         "type": condition.get("operator"),
         "field": condition.get("field"),
         "value": condition.get("value"),
@@ -93,98 +268,394 @@ def matches_condition(image, condition):
         "pattern": condition.get("pattern"),
     }
 
-    return execute_rule(image, condition_rule)
+    if compiled_conditions is None:
+        return compile_rule(rule)
 
+    # Identical `when` clauses share the same compiled rule, which the
+    # evaluation uses to compute them once per record.
+    key = json.dumps(rule, sort_keys=True, default=repr)
 
-def is_excluded(image, exclusions):
-    for exclusion in exclusions:
-        if execute_rule(image, exclusion):
-            return True, exclusion.get("name")
+    if key not in compiled_conditions:
+        compiled_conditions[key] = compile_rule(rule)
+
+    return compiled_conditions[key]
+
+
+def _rule_cost(rule):
+    return RULE_COSTS.get(rule.rule_type, 0)
 
-    return False, None
 
+def _order_rules(rules):
+    # A check fails as soon as one of its rules fails, so the cheap rules
+    # run first. Only rules that cannot raise are reordered: checks with a
+    # rule that may raise keep the configured order, so the same records
+    # reach it and end up in ProcessingFailed as before.
+    if any(rule.error is not None for rule in rules):
+        return rules
 
-def execute_check(image, check):
-    condition = check.get("when")
+    return tuple(sorted(rules, key=_rule_cost))
 
-    if condition and not matches_condition(image, condition):
-        return True
 
+def compile_check(check, compiled_conditions=None):
     nested_rules = check.get("rules")
 
     if nested_rules:
-        return all(
-            execute_rule(image, nested_rule)
+        rules = tuple(
+            compile_rule(nested_rule)
             for nested_rule in nested_rules
         )
+    else:
+        rules = (compile_rule(check),)
+
+    return CompiledCheck(
+        name=check.get("name", "unnamed_check"),
+        error_code=check.get("errorCode", "DQ_CHECK_FAILED"),
+        condition=compile_condition(check.get("when"), compiled_conditions),
+        rules=_order_rules(rules),
+    )
+
+
+# (table, check, rule type) -> [evaluations, cumulative seconds]
+_profile_stats = {}
+
+
+def _profile_rule(table, check_name, rule):
+    stats = _profile_stats.setdefault(
+        (table, check_name, rule.rule_type),
+        [0, 0.0],
+    )
+    test = rule.test
+
+    def profiled_test(*values):
+        started = perf_counter()
+
+        try:
+            return test(*values)
+        finally:
+            stats[0] += 1
+            stats[1] += perf_counter() - started
+
+    return rule._replace(test=profiled_test)
+
+
+def _profile_plan(table, exclusions, checks):
+    exclusions = tuple(
+        exclusion._replace(
+            rule=_profile_rule(table, exclusion.name, exclusion.rule),
+        )
+        for exclusion in exclusions
+    )
+
+    # A condition shared by several checks is reported under the name of
+    # the first check using it.
+    conditions = {}
+
+    for check in checks:
+        if check.condition is not None and check.condition not in conditions:
+            conditions[check.condition] = _profile_rule(
+                table,
+                f"{check.name}.when",
+                check.condition,
+            )
+
+    checks = tuple(
+        check._replace(
+            condition=conditions.get(check.condition),
+            rules=tuple(
+                _profile_rule(table, check.name, rule)
+                for rule in check.rules
+            ),
+        )
+        for check in checks
+    )
+
+    return exclusions, checks
+
+
+def collect_profile():
+    """
+    Return the rule evaluations recorded since the previous call, as
+    {(table, check, rule type): (evaluations, seconds)}, and reset them.
+    """
+    profile = {}
+
+    for key, stats in _profile_stats.items():
+        if stats[0]:
+            profile[key] = tuple(stats)
+            stats[:] = [0, 0.0]
+
+    return profile
+
+
+def merge_profile(target, source):
+    for key, (evaluations, seconds) in source.items():
+        previous_evaluations, previous_seconds = target.get(key, (0, 0.0))
+        target[key] = (
+            previous_evaluations + evaluations,
+            previous_seconds + seconds,
+        )
+
+    return target
 
-    return execute_rule(image, check)
 
+def _plan_rules(exclusions, checks):
+    for exclusion in exclusions:
+        yield exclusion.rule
+
+    for check in checks:
+        if check.condition is not None:
+            yield check.condition
+
+        yield from check.rules
 
-def execute_dq(payload, config):
+
+def compile_table_config(config):
     image_priority = (
         config
         .get("imageSelection", {})
-        .get(
-            "priority",
-            ["NewImage", "OldImage", "Keys"],
+        .get("priority", DEFAULT_IMAGE_PRIORITY)
+    )
+
+    routing = config.get("routing", {})
+
+    exclusions = tuple(
+        CompiledExclusion(
+            name=exclusion.get("name"),
+            rule=compile_rule(exclusion),
         )
+        for exclusion in config.get("exclusions", [])
     )
 
-    image, image_source = get_image(
-        payload=payload,
-        priority=image_priority,
+    compiled_conditions = {}
+
+    checks = tuple(
+        compile_check(check, compiled_conditions)
+        for check in config.get("checks", [])
     )
 
-    routing = config.get("routing", {})
+    if DQ_PROFILE:
+        exclusions, checks = _profile_plan(
+            config.get("table"),
+            exclusions,
+            checks,
+        )
 
-    excluded, exclusion_name = is_excluded(
-        image=image,
-        exclusions=config.get("exclusions", []),
+    return TablePlan(
+        table=config.get("table"),
+        image_priority=tuple(image_priority or DEFAULT_IMAGE_PRIORITY),
+        clean_status=routing.get("cleanStatus", "clean"),
+        quarantine_status=routing.get("quarantineStatus", "quarantine"),
+        excluded_status=routing.get("excludedStatus", "excluded"),
+        exclusions=exclusions,
+        checks=checks,
+        filters=tuple(
+            compile_filter(rule)
+            for rule in config.get("filters", [])
+        ),
+        fields=tuple(dict.fromkeys(
+            field_name
+            for rule in _plan_rules(exclusions, checks)
+            for field_name in rule.fields
+        )),
     )
 
-    if excluded:
-        return {
-            "processingLayer": routing.get(
-                "excludedStatus",
-                "excluded",
-            ),
-            "errors": [],
-            "imageSource": image_source,
-            "exclusion": exclusion_name,
-        }
 
-    errors = []
+def evaluate_rule(image, rule):
+    return rule.test(*[
+        get_value(image, field_name)
+        for field_name in rule.fields
+    ])
 
-    for check in config.get("checks", []):
-        if execute_check(image, check):
-            continue
 
-        errors.append({
-            "code": check.get(
-                "errorCode",
-                "DQ_CHECK_FAILED",
-            ),
-            "check": check.get(
-                "name",
-                "unnamed_check",
-            ),
-        })
+def evaluate_check(image, check, conditions=None):
+    condition = check.condition
 
-    if errors:
-        processing_layer = routing.get(
-            "quarantineStatus",
-            "quarantine",
-        )
+    if condition is not None:
+        # Conditions shared by several checks are evaluated once per record.
+        if conditions is None:
+            applies = evaluate_rule(image, condition)
+        elif condition in conditions:
+            applies = conditions[condition]
+        else:
+            applies = conditions[condition] = evaluate_rule(image, condition)
+
+        if not applies:
+            return True
+
+    return all(
+        evaluate_rule(image, rule)
+        for rule in check.rules
+    )
+
+
+def find_exclusion(image, exclusions):
+    for exclusion in exclusions:
+        if evaluate_rule(image, exclusion.rule):
+            return exclusion
+
+    return None
+
+
+def _build_result(plan, image_source, exclusion, errors):
+    if exclusion is not None:
+        processing_layer = plan.excluded_status
+    elif errors:
+        processing_layer = plan.quarantine_status
     else:
-        processing_layer = routing.get(
-            "cleanStatus",
-            "clean",
-        )
+        processing_layer = plan.clean_status
 
     return {
         "processingLayer": processing_layer,
         "errors": errors,
         "imageSource": image_source,
-        "exclusion": None,
-    }
\ No newline at end of file
+        "exclusion": exclusion.name if exclusion is not None else None,
+    }
+
+
+def execute_dq(payload, plan):
+    image, image_source = get_image(
+        payload=payload,
+        priority=plan.image_priority,
+    )
+
+    exclusion = find_exclusion(
+        image=image,
+        exclusions=plan.exclusions,
+    )
+
+    if exclusion is not None:
+        return _build_result(plan, image_source, exclusion, [])
+
+    conditions = {}
+
+    errors = [
+        {
+            "code": check.error_code,
+            "check": check.name,
+        }
+        for check in plan.checks
+        if not evaluate_check(image, check, conditions)
+    ]
+
+    return _build_result(plan, image_source, None, errors)
+
+
+def _evaluate_column(rule, columns, indices):
+    if not indices:
+        return []
+
+    if not rule.fields:
+        return [rule.test()] * len(indices)
+
+    return list(map(
+        rule.test,
+        *[
+            [columns[field_name][index] for index in indices]
+            for field_name in rule.fields
+        ]
+    ))
+
+
+def _find_check_failures(check, columns, indices, condition_columns):
+    # Mirrors evaluate_check: rules are evaluated only on the records
+    # where the condition applies and every previous rule passed.
+    if check.condition is not None:
+        applies = condition_columns.get(check.condition)
+
+        if applies is None:
+            applies = _evaluate_column(check.condition, columns, indices)
+            condition_columns[check.condition] = applies
+
+        indices = [
+            index
+            for index, applied in zip(indices, applies)
+            if applied
+        ]
+
+    failures = []
+
+    for rule in check.rules:
+        passing = []
+
+        for index, passed in zip(
+            indices,
+            _evaluate_column(rule, columns, indices),
+        ):
+            (passing if passed else failures).append(index)
+
+        indices = passing
+
+    return failures
+
+
+def execute_dq_batch(payloads, plan):
+    """
+    Evaluate the plan over all the payloads of one table at once.
+
+    Every referenced field is read once per record into a flat column and
+    each rule runs over the column of the records still to be decided; the
+    per-record results are the same as calling execute_dq on each payload.
+    Any error raised by a rule is propagated, so the caller can fall back
+    to execute_dq per record.
+    """
+    selected = [
+        get_image(payload=payload, priority=plan.image_priority)
+        for payload in payloads
+    ]
+
+    size = len(selected)
+
+    columns = {
+        field_name: [get_value(image, field_name) for image, _ in selected]
+        for field_name in plan.fields
+    }
+
+    exclusions = [None] * size
+    remaining = list(range(size))
+
+    for exclusion in plan.exclusions:
+        not_matched = []
+
+        for index, matched in zip(
+            remaining,
+            _evaluate_column(exclusion.rule, columns, remaining),
+        ):
+            if matched:
+                exclusions[index] = exclusion
+            else:
+                not_matched.append(index)
+
+        remaining = not_matched
+
+    errors = [[] for _ in range(size)]
+    condition_columns = {}
+
+    # Checks are visited in configuration order, so every error list keeps
+    # the order of the configured checks.
+    for check in plan.checks:
+        error = {
+            "code": check.error_code,
+            "check": check.name,
+        }
+
+        for index in _find_check_failures(
+            check,
+            columns,
+            remaining,
+            condition_columns,
+        ):
+            errors[index].append(dict(error))
+
+    results = []
+
+    for index, (_, image_source) in enumerate(selected):
+        results.append(
+            _build_result(
+                plan,
+                image_source,
+                exclusions[index],
+                errors[index],
+            )
+        )
+
+    return results
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+import zlib
+
+
+EMF_NAMESPACE = os.environ.get("EMF_NAMESPACE", "CDC/DataQualityFilter")
+EMF_DIMENSIONS = [["TableName"]]
+EMF_METRIC_UNIT = "Count"
+
+# Share of quarantined and excluded records whose detail is logged.
+DQ_LOG_SAMPLE_RATE = float(os.environ.get("DQ_LOG_SAMPLE_RATE", "0.01"))
+
+_SAMPLE_BUCKETS = 10000
+
+
+def should_log_record(record_id):
+    if DQ_LOG_SAMPLE_RATE >= 1:
+        return True
+
+    if DQ_LOG_SAMPLE_RATE <= 0:
+        return False
+
+    # Hashing the recordId keeps the sampling stable across Firehose
+    # retries and independent of the worker processing the record.
+    bucket = zlib.crc32(str(record_id).encode("utf-8")) % _SAMPLE_BUCKETS
+
+    return bucket < DQ_LOG_SAMPLE_RATE * _SAMPLE_BUCKETS
+
+
+def count_metric(metrics, table_name, metric_name, value=1):
+    table_metrics = metrics.setdefault(str(table_name or "UNKNOWN"), {})
+    table_metrics[metric_name] = table_metrics.get(metric_name, 0) + value
+
+
+def count_record(
+    metrics,
+    table_name,
+    processing_layer,
+    dq_result=None,
+    value=1,
+):
+    count_metric(metrics, table_name, f"Layer.{processing_layer}", value)
+
+    if dq_result is None:
+        return
+
+    for error in dq_result.get("errors", []):
+        count_metric(
+            metrics,
+            table_name,
+            f"ErrorCode.{error['code']}",
+            value,
+        )
+
+    if dq_result.get("exclusion") is not None:
+        count_metric(
+            metrics,
+            table_name,
+            f"Exclusion.{dq_result['exclusion']}",
+            value,
+        )
+
+
+def merge_metrics(target, source):
+    for table_name, table_metrics in source.items():
+        for metric_name, value in table_metrics.items():
+            count_metric(target, table_name, metric_name, value)
+
+    return target
+
+
+def build_emf_documents(metrics, timestamp_ms=None):
+    """
+    Build the EMF documents for the batch counters.
+
+    EMF binds a single value to each dimension of a document, so the batch
+    produces one document per table, holding every counter of that table.
+    """
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+
+    documents = []
+
+    for table_name, table_metrics in sorted(metrics.items()):
+        document = {
+            "_aws": {
+                "Timestamp": timestamp_ms,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": EMF_NAMESPACE,
+                        "Dimensions": EMF_DIMENSIONS,
+                        "Metrics": [
+                            {"Name": metric_name, "Unit": EMF_METRIC_UNIT}
+                            for metric_name in sorted(table_metrics)
+                        ],
+                    }
+                ],
+            },
+            "TableName": table_name,
+        }
+        document.update(table_metrics)
+        documents.append(document)
+
+    return documents
+
+
+def emit_metrics(metrics):
+    for document in build_emf_documents(metrics):
+        print(json.dumps(document))
+
+
+def emit_profile(profile):
+    """
+    Log the rule evaluations of the batch collected by the DQ_PROFILE
+    instrumentation, slowest rules first.
+    """
+    if not profile:
+        return
+
+    total_seconds = sum(seconds for _, seconds in profile.values()) or 1e-9
+
+    histogram = [
+        {
+            "table": table_name,
+            "check": check_name,
+            "ruleType": rule_type,
+            "evaluations": evaluations,
+            "totalMs": round(seconds * 1000, 3),
+            "avgUs": round(seconds * 1e6 / evaluations, 3),
+            "share": round(seconds / total_seconds, 4),
+        }
+        for (table_name, check_name, rule_type), (evaluations, seconds)
+        in sorted(
+            profile.items(),
+            key=lambda item: item[1][1],
+            reverse=True,
+        )
+    ]
+
+    print(f"DQ rule profile. Rules={json.dumps(histogram)}")
@@ -0,0 +1,40 @@
+import json
+
+from processor.ddb_utils import get_dynamodb
+
+
+def duplicate_keys(table_name, payload):
+    """
+    Return the keys identifying the change carried by the payload: the
+    stream eventID and, when present, the item key with the stream
+    SequenceNumber.
+    """
+    keys = []
+
+    event_id = payload.get("eventID")
+
+    if event_id is not None:
+        keys.append(("eventID", event_id))
+
+    dynamodb = get_dynamodb(payload)
+    sequence_number = dynamodb.get("SequenceNumber")
+
+    if sequence_number is not None:
+        item_key = json.dumps(
+            dynamodb.get("Keys"),
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+        keys.append(("change", table_name, item_key, sequence_number))
+
+    return tuple(keys)
+
+
+def check_duplicate(seen, keys):
+    # Every record adds its keys, so a record sharing any key with an
+    # earlier record of the batch is a duplicate.
+    duplicate = any(key in seen for key in keys)
+    seen.update(keys)
+
+    return duplicate
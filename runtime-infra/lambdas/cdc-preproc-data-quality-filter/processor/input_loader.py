@@ -1,8 +1,12 @@
+import hashlib
+import json
 import os
 from pathlib import Path
 
 import yaml
 
+from processor.dq_executor import compile_table_config
+
 
 DEFAULT_CONFIG_PATH = (
     Path(__file__).resolve().parent.parent / "config"
@@ -14,7 +18,23 @@ CONFIG_PATH = Path(
 
 MANIFEST_PATH = CONFIG_PATH / "manifest.yaml"
 
+BUNDLE_PATH = Path(
+    os.environ.get("CONFIG_BUNDLE_PATH", str(CONFIG_PATH / "bundle.json"))
+)
+
+BUNDLE_FORMAT = 1
+
+# yaml: always read the YAML sources, bundle: require the bundle built by
+# the packaging step, auto: use the bundle when present and in sync with
+# the YAML sources. No bundle ships by default, hence yaml.
+CONFIG_SOURCE = os.environ.get("CONFIG_SOURCE", "yaml").strip().lower()
+
+CONFIG_WARMUP = (
+    os.environ.get("CONFIG_WARMUP", "false").strip().lower() == "true"
+)
+
 _manifest_cache = None
+_bundle_cache = None
 _table_config_cache = {}
 
 
@@ -35,22 +55,94 @@ def _load_yaml(file_path):
     return content
 
 
+def config_fingerprint(config_path=CONFIG_PATH):
+    digest = hashlib.sha256()
+
+    for file_path in sorted(config_path.rglob("*.yaml")):
+        digest.update(
+            file_path.relative_to(config_path).as_posix().encode("utf-8")
+        )
+        digest.update(b"\0")
+        digest.update(file_path.read_bytes())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def _read_bundle():
+    if CONFIG_SOURCE == "yaml":
+        return None
+
+    if CONFIG_SOURCE not in ("auto", "bundle"):
+        raise ValueError(
+            f"Unsupported CONFIG_SOURCE: {CONFIG_SOURCE}"
+        )
+
+    if not BUNDLE_PATH.is_file():
+        if CONFIG_SOURCE == "bundle":
+            raise FileNotFoundError(
+                f"Configuration bundle not found: {BUNDLE_PATH}"
+            )
+
+        return None
+
+    with BUNDLE_PATH.open("r", encoding="utf-8") as file:
+        bundle = json.load(file)
+
+    if (
+        not isinstance(bundle, dict)
+        or bundle.get("format") != BUNDLE_FORMAT
+        or not isinstance(bundle.get("manifest"), dict)
+        or not isinstance(bundle.get("tables"), dict)
+    ):
+        raise ValueError(
+            f"Invalid configuration bundle: {BUNDLE_PATH}"
+        )
+
+    # Only auto hashes the YAML sources, once the bundle has been found:
+    # the bundle mode trusts the packaging step.
+    if (
+        CONFIG_SOURCE == "auto"
+        and MANIFEST_PATH.is_file()
+        and bundle.get("sourceHash") != config_fingerprint()
+    ):
+        print(
+            "Configuration bundle is out of date, "
+            f"falling back to YAML. Bundle={BUNDLE_PATH}"
+        )
+
+        return None
+
+    return bundle
+
+
+def load_bundle():
+    global _bundle_cache
+
+    if _bundle_cache is None:
+        _bundle_cache = _read_bundle() or {}
+
+    return _bundle_cache or None
+
+
 def load_manifest():
     global _manifest_cache
 
     if _manifest_cache is None:
-        _manifest_cache = _load_yaml(MANIFEST_PATH)
+        bundle = load_bundle()
+
+        if bundle is not None:
+            _manifest_cache = bundle["manifest"]
+        else:
+            _manifest_cache = load_yaml_manifest()
 
     return _manifest_cache
 
 
-def load_table_config(table_name):
+def get_enabled_table_entry(table_name):
     if not table_name:
         return None
 
-    if table_name in _table_config_cache:
-        return _table_config_cache[table_name]
-
     manifest = load_manifest()
     table_entry = manifest.get("tables", {}).get(table_name)
 
@@ -60,6 +152,14 @@ def load_table_config(table_name):
     if not table_entry.get("enabled", True):
         return None
 
+    return table_entry
+
+
+def load_yaml_manifest():
+    return _load_yaml(MANIFEST_PATH)
+
+
+def load_yaml_table_config(table_name, table_entry):
     config_file = table_entry.get("config")
 
     if not config_file:
@@ -67,8 +167,7 @@ def load_table_config(table_name):
             f"Missing configuration path for table: {table_name}"
         )
 
-    config_path = CONFIG_PATH / config_file
-    table_config = _load_yaml(config_path)
+    table_config = _load_yaml(CONFIG_PATH / config_file)
 
     configured_table = table_config.get("table")
 
@@ -78,6 +177,57 @@ def load_table_config(table_name):
             f"found {configured_table}"
         )
 
-    _table_config_cache[table_name] = table_config
+    return table_config
+
+
+def read_table_config(table_name, table_entry):
+    bundle = load_bundle()
+
+    if bundle is None:
+        return load_yaml_table_config(table_name, table_entry)
+
+    table_config = bundle["tables"].get(table_name)
+
+    if not isinstance(table_config, dict):
+        raise ValueError(
+            f"Table missing from configuration bundle: {table_name}"
+        )
+
+    return table_config
+
+
+def load_table_config(table_name):
+    if not table_name:
+        return None
+
+    if table_name in _table_config_cache:
+        return _table_config_cache[table_name]
+
+    table_entry = get_enabled_table_entry(table_name)
+
+    if table_entry is None:
+        return None
+
+    table_config = read_table_config(table_name, table_entry)
+    table_plan = compile_table_config(table_config)
+
+    _table_config_cache[table_name] = table_plan
+
+    return table_plan
+
+
+def warm_up_table_configs():
+    manifest = load_manifest()
 
-    return table_config
\ No newline at end of file
+    # A table that cannot be loaded is left out of the cache: its records
+    # fail one by one when the batch loads the table again.
+    for table_name in manifest.get("tables", {}):
+        try:
+            load_table_config(table_name)
+        except Exception as error:
+            print(
+                "Table configuration warm-up failed. "
+                f"Table={table_name}, Error={error}"
+            )
+
+    return len(_table_config_cache)
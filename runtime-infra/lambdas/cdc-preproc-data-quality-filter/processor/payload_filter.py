@@ -1,37 +1,115 @@
-from processor.ddb_utils import remove_fields
+from collections import namedtuple
 
+from processor.ddb_utils import keep_fields, remove_fields
 
-def _apply_remove_fields(payload, rule):
-    return remove_fields(
-        payload=payload,
-        field_names=rule.get("fields", []),
-        image_names=rule.get(
-            "images",
-            ["NewImage", "OldImage"],
-        ),
-    )
 
+DEFAULT_FILTER_IMAGES = (
+    "NewImage",
+    "OldImage",
+)
+
+# A compiled filter applies to the layers in `apply_to` (all the layers
+# when empty); `apply` returns the payload and whether it was modified.
+CompiledFilter = namedtuple(
+    "CompiledFilter",
+    ["name", "apply_to", "apply"],
+)
+
+
+# A filter with an invalid configuration fails the records of the layers
+# it applies to, instead of silently rewriting their payload.
+def _failing_filter(message):
+    def apply(payload):
+        raise ValueError(message)
+
+    return apply
+
+
+def _compile_remove_fields(rule):
+    field_names = tuple(rule.get("fields", []))
+    image_names = tuple(rule.get("images", DEFAULT_FILTER_IMAGES))
+
+    def apply(payload):
+        return remove_fields(
+            payload=payload,
+            field_names=field_names,
+            image_names=image_names,
+        )
+
+    return apply
+
+
+def _compile_keep_fields(rule):
+    fields = rule.get("fields")
+
+    # Without fields to keep the filter would strip every attribute.
+    if not isinstance(fields, (list, tuple)) or not fields:
+        return _failing_filter(
+            f"Invalid keep_fields filter {rule.get('name')!r}: "
+            f"a non-empty list of fields is required"
+        )
 
-FILTER_HANDLERS = {
-    "remove_fields": _apply_remove_fields,
+    field_names = frozenset(fields)
+    image_names = tuple(rule.get("images", DEFAULT_FILTER_IMAGES))
+
+    def apply(payload):
+        return keep_fields(
+            payload=payload,
+            field_names=field_names,
+            image_names=image_names,
+        )
+
+    return apply
+
+
+FILTER_COMPILERS = {
+    "remove_fields": _compile_remove_fields,
+    "keep_fields": _compile_keep_fields,
 }
 
 
+def compile_filter(rule):
+    filter_type = rule.get("type")
+    compiler = FILTER_COMPILERS.get(filter_type)
+
+    # Unknown filters keep failing only for the records of the layers
+    # they apply to.
+    if compiler is None:
+        apply = _failing_filter(
+            f"Unsupported payload filter: {filter_type}"
+        )
+    else:
+        apply = compiler(rule)
+
+    return CompiledFilter(
+        name=rule.get("name"),
+        apply_to=frozenset(rule.get("applyTo", [])),
+        apply=apply,
+    )
+
+
 def apply_filters(payload, processing_layer, filters):
-    for rule in filters:
-        apply_to = rule.get("applyTo", [])
+    modified = False
+
+    for compiled_filter in filters:
+        apply_to = compiled_filter.apply_to
 
         if apply_to and processing_layer not in apply_to:
             continue
 
-        filter_type = rule.get("type")
-        handler = FILTER_HANDLERS.get(filter_type)
+        payload, rule_modified = compiled_filter.apply(payload)
+        modified = modified or rule_modified
+
+    return payload, modified
+
 
-        if handler is None:
-            raise ValueError(
-                f"Unsupported payload filter: {filter_type}"
-            )
+# Applies every filter, whatever its layers: used for the records that
+# are not evaluated, so a field removed from any layer is never written.
+def apply_all_filters(payload, filters):
+    modified = False
 
-        payload = handler(payload, rule)
+    for compiled_filter in filters:
+        payload, rule_modified = compiled_filter.apply(payload)
+        modified = modified or rule_modified
 
-    return payload
\ No newline at end of file
+    return payload, modified
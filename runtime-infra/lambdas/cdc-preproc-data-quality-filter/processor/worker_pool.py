@@ -0,0 +1,113 @@
+import multiprocessing
+import sys
+import time
+
+
+# AWS Lambda does not provide /dev/shm, so multiprocessing.Pool and
+# ProcessPoolExecutor cannot be used: workers are plain forked processes
+# returning their result through a Pipe. Forking also lets every worker
+# reuse the table plans already compiled by the parent process.
+_context = multiprocessing.get_context("fork")
+
+
+def split_chunks(items, chunk_count):
+    chunk_count = max(1, min(chunk_count, len(items)))
+    chunk_size, remainder = divmod(len(items), chunk_count)
+
+    chunks = []
+    start = 0
+
+    for index in range(chunk_count):
+        end = start + chunk_size + (1 if index < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
+def _run_chunk(function, chunk, connection):
+    # Line buffering (also with PYTHONUNBUFFERED) writes each log line with
+    # a single call, keeping the lines of concurrent processes whole. Only
+    # the forked worker is reconfigured: the stdout of the calling process
+    # is left untouched.
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True, write_through=False)
+
+    try:
+        connection.send(function(chunk))
+    finally:
+        connection.close()
+
+
+def map_chunks(function, chunks, timeout=None):
+    """
+    Apply function to every chunk, in parallel, preserving the chunk order.
+
+    The last chunk runs in the calling process. A chunk whose worker fails,
+    or does not return within timeout seconds from the start, is processed
+    again in the calling process.
+    """
+    if not chunks:
+        return []
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    # Pending output would otherwise be flushed again by every worker.
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    workers = []
+
+    for chunk in chunks[:-1]:
+        receiver, sender = _context.Pipe(duplex=False)
+        process = _context.Process(
+            target=_run_chunk,
+            args=(function, chunk, sender),
+        )
+        process.start()
+        sender.close()
+        workers.append((chunk, process, receiver))
+
+    last_result = function(chunks[-1])
+
+    # The output of the calling process is written before waiting, so it
+    # does not interleave with the lines of the workers still running.
+    sys.stdout.flush()
+
+    results = []
+
+    for chunk, process, receiver in workers:
+        result = None
+
+        try:
+            if deadline is None or receiver.poll(
+                max(0, deadline - time.monotonic())
+            ):
+                result = receiver.recv()
+        except EOFError:
+            pass
+        finally:
+            receiver.close()
+
+        if process.is_alive() and result is None:
+            print(
+                "Worker process timed out, terminating it. "
+                f"Pid={process.pid}"
+            )
+            process.terminate()
+
+        process.join()
+
+        if result is None:
+            print(
+                "Worker process failed, processing chunk in the main "
+                f"process. ExitCode={process.exitcode}, "
+                f"Records={len(chunk)}"
+            )
+            result = function(chunk)
+
+        results.append(result)
+
+    results.append(last_result)
+
+    return results
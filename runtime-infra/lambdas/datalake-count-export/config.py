@@ -31,6 +31,12 @@ ATHENA_RESULTS_BUCKET = os.environ['ATHENA_RESULTS_BUCKET']
 DATABASE = os.environ['ATHENA_DATABASE']
 WORKGROUP = os.environ['ATHENA_WORKGROUP']
 MAX_WORKERS = int(os.environ['MAX_WORKERS'])
+# 'union': counts collapsed into UNION ALL queries of COUNT_UNION_CHUNK_SIZE tables, 'per_table': one query per table
+COUNT_EXECUTION_MODE = os.environ.get('COUNT_EXECUTION_MODE', 'per_table')
+COUNT_UNION_CHUNK_SIZE = int(os.environ.get('COUNT_UNION_CHUNK_SIZE', '25'))
+
+if COUNT_EXECUTION_MODE not in ('union', 'per_table'):
+    raise ValueError(f"Unsupported COUNT_EXECUTION_MODE: {COUNT_EXECUTION_MODE}")
 
 if not all([CONFIG_GIT_URL, OUTPUT_BUCKET, ATHENA_RESULTS_BUCKET, DATABASE, WORKGROUP]):
     raise ValueError("Missing required environment variables")
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Git config client with warm-invocation cache and conditional requests"""
+import hashlib
+import json
+import logging
+import os
+import time
+import urllib.request
+from urllib.error import HTTPError
+
+logger = logging.getLogger()
+
+# Each Lambda package ships its own copy of this module: keep them identical.
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '300'))
+CONFIG_CACHE_DIR = os.environ.get('CONFIG_CACHE_DIR', '/tmp')
+CONFIG_FETCH_TIMEOUT_SECONDS = 10
+
+# url -> {'config', 'etag', 'fetched_at'}, kept across warm invocations
+_cache = {}
+
+
+def _fallback_path(url):
+    """Build the /tmp copy path; the URL is hashed since it may carry a token"""
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CONFIG_CACHE_DIR, f"git-config-{digest}.json")
+
+
+def _parse_config(content):
+    """Parse the raw config file content"""
+    content = content.strip()
+
+    if not content:
+        raise ValueError("Git config file is empty")
+
+    return json.loads(content)
+
+
+def _read_fallback(url):
+    """Load the last good copy written to /tmp, if any"""
+    try:
+        with open(_fallback_path(url), 'r', encoding='utf-8') as file:
+            stored = json.load(file)
+
+        return {
+            'config': _parse_config(stored['content']),
+            'etag': stored.get('etag'),
+            'fetched_at': None
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_fallback(url, etag, content):
+    """Persist the last good copy to /tmp, replacing the previous one atomically"""
+    path = _fallback_path(url)
+
+    try:
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump({'etag': etag, 'content': content}, file)
+
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.warning(f"Failed to write config fallback copy: {e}")
+
+
+def fetch_config(url, ttl_seconds=CONFIG_CACHE_TTL_SECONDS):
+    """
+    Retrieve a JSON config file from Git
+
+    Within ttl_seconds the copy held in memory is returned without any
+    request. Afterwards the file is revalidated with If-None-Match, so an
+    unchanged file costs a 304 without body. When Git is slow or unavailable
+    the last good copy (memory, then /tmp) is used instead of failing.
+    """
+    entry = _cache.get(url)
+
+    if entry and time.monotonic() - entry['fetched_at'] < ttl_seconds:
+        logger.info(f"Using cached config ({time.monotonic() - entry['fetched_at']:.0f}s old)")
+        return entry['config']
+
+    if entry is None:
+        entry = _read_fallback(url)
+
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+
+    try:
+        request = urllib.request.Request(url, headers=headers)
+
+        with urllib.request.urlopen(request, timeout=CONFIG_FETCH_TIMEOUT_SECONDS) as response:
+            content = response.read().decode('utf-8')
+            etag = response.headers.get('ETag')
+
+        config = _parse_config(content)
+        _write_fallback(url, etag, content)
+
+    except HTTPError as e:
+        if e.code == 304 and entry:
+            logger.info("Config not modified since last fetch")
+            config, etag = entry['config'], entry['etag']
+        elif e.code == 404:
+            raise FileNotFoundError(f"Config file not found at {url}")
+        elif entry:
+            logger.warning(f"Failed to fetch config from Git (HTTP {e.code}), using last good copy")
+            config, etag = entry['config'], entry['etag']
+        else:
+            raise RuntimeError(f"Failed to fetch config from Git (HTTP {e.code}): {url}")
+    except Exception as e:
+        if not entry:
+            raise RuntimeError(f"Failed to fetch config from Git: {e}")
+
+        logger.warning(f"Failed to fetch config from Git ({e}), using last good copy")
+        config, etag = entry['config'], entry['etag']
+
+    # A stale copy is also kept for a full TTL, so an unavailable endpoint
+    # is not retried (and waited for) on every invocation.
+    _cache[url] = {
+        'config': config,
+        'etag': etag,
+        'fetched_at': time.monotonic()
+    }
+
+    return config
@@ -2,16 +2,16 @@ import boto3
 import json
 import os
 import re
-import time
-import urllib.request
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor
-from urllib.error import HTTPError
 
 from config import (
     logger, setup_logger, CONFIG_GIT_URL,
-    OUTPUT_BUCKET, ATHENA_RESULTS_BUCKET, DATABASE, WORKGROUP, MAX_WORKERS
+    OUTPUT_BUCKET, ATHENA_RESULTS_BUCKET, DATABASE, WORKGROUP, MAX_WORKERS,
+    COUNT_EXECUTION_MODE, COUNT_UNION_CHUNK_SIZE
 )
+from config_client import fetch_config
+from athena_runner import compute_deadline, run_queries, check_succeeded
+from query_guard import guard_queries, QUERY_MAX_SCANNED_BYTES
 
 athena = boto3.client('athena')
 s3 = boto3.client('s3')
@@ -22,24 +22,9 @@ def fetch_config_from_git():
     if not CONFIG_GIT_URL:
         raise ValueError("CONFIG_GIT_URL is required")
     
-    url = CONFIG_GIT_URL
-    logger.info(f"Fetching config from Git: {url}")
+    logger.info(f"Fetching config from Git: {CONFIG_GIT_URL}")
     
-    try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            content = response.read().decode('utf-8').strip()
-            
-            if not content:
-                raise ValueError("Git config file is empty")
-            
-            return json.loads(content)
-            
-    except HTTPError as e:
-        if e.code == 404:
-            raise FileNotFoundError(f"Config file not found at {url}")
-        raise RuntimeError(f"Failed to fetch config from Git (HTTP {e.code}): {url}")
-    except Exception as e:
-        raise RuntimeError(f"Failed to fetch config from Git: {e}")
+    return fetch_config(CONFIG_GIT_URL)
 
 
 def fetch_custom_queries():
@@ -50,51 +35,219 @@ def fetch_custom_queries():
     return fetch_config_from_git()
 
 
-def execute_count_query(query, output_prefix):
-    """Execute Athena count query and wait for completion."""
-    logger.info(f"Executing query: {query}")
+def read_count(query_execution_id):
+    """Read the count returned by a succeeded Athena query."""
+    results = athena.get_query_results(QueryExecutionId=query_execution_id)
+    rows = results['ResultSet']['Rows']
     
-    response = athena.start_query_execution(
-        QueryString=query,
-        QueryExecutionContext={'Database': DATABASE},
-        ResultConfiguration={'OutputLocation': f"s3://{ATHENA_RESULTS_BUCKET}/{output_prefix}"},
-        WorkGroup=WORKGROUP
-    )
-    query_id = response['QueryExecutionId']
+    if len(rows) > 1:
+        return int(rows[1]['Data'][0]['VarCharValue'])
+    
+    return 0
+
+
+def format_count_queries(custom_configs, date_params):
+    """Format every configured query with the date parameters."""
+    queries = {}
+    
+    for report_name, config in custom_configs.items():
+        queries[report_name] = config['query'].format(**date_params)
+        logger.info(f"Executing query: {queries[report_name]}")
+    
+    return queries
+
+
+def run_table_queries(queries, deadline):
+    """Execute one count query per table."""
+    table_queries = {
+        report_name: (query, f"s3://{ATHENA_RESULTS_BUCKET}/athena_results/{report_name}")
+        for report_name, query in queries.items()
+    }
+    
+    # At most MAX_WORKERS queries in flight, all polled with one batch call
+    executions = run_queries(table_queries, DATABASE, WORKGROUP, deadline=deadline, max_concurrency=MAX_WORKERS)
+    
+    return {
+        report_name: read_count(check_succeeded(executions[report_name])['QueryExecutionId'])
+        for report_name in queries
+    }
+
+
+def build_union_query(queries):
+    """
+    Collapse count queries into one UNION ALL query tagged by report name.
+    Each branch is aggregated into exactly one row, whatever the row order:
+    like a single query, a branch counts the value of one of its rows, and
+    row_count tells an empty branch from a NULL count.
+    """
+    branches = []
+    
+    for report_name, query in queries.items():
+        literal = report_name.replace("'", "''")
+        query = query.strip().rstrip(';')
+        branches.append(
+            f"SELECT '{literal}' AS report_name, arbitrary(send_count) AS send_count, count(*) AS row_count FROM (\n{query}\n) AS branch(send_count)"
+        )
+    
+    return "\nUNION ALL\n".join(branches)
+
+
+def read_union_counts(query_execution_id):
+    """
+    Read the counts returned by a succeeded UNION ALL query, by report name.
+    Raises KeyError or ValueError when a branch does not hold a valid count.
+    """
+    counts = {}
+    kwargs = {'QueryExecutionId': query_execution_id}
+    header = True
     
     while True:
-        execution = athena.get_query_execution(QueryExecutionId=query_id)
-        status = execution['QueryExecution']['Status']['State']
+        results = athena.get_query_results(**kwargs)
+        rows = results['ResultSet']['Rows']
         
-        if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-            break
+        # First row of the first page is the header
+        if header:
+            rows = rows[1:]
+            header = False
         
-        time.sleep(2)
-    
-    if status != 'SUCCEEDED':
-        reason = execution['QueryExecution']['Status'].get('StateChangeReason', 'Unknown')
-        raise RuntimeError(f"Query {query_id} failed: {reason}")
-    
-    results = athena.get_query_results(QueryExecutionId=query_id)
-    rows = results['ResultSet']['Rows']
+        for row in rows:
+            report_name = row['Data'][0]['VarCharValue']
+            
+            # A branch without rows counts 0, as a single query without rows
+            if int(row['Data'][2]['VarCharValue']) == 0:
+                counts[report_name] = 0
+                continue
+            
+            send_count = row['Data'][1].get('VarCharValue')
+            if send_count is None:
+                raise ValueError(f"NULL count for {report_name}")
+            
+            counts[report_name] = int(send_count)
+        
+        if not results.get('NextToken'):
+            return counts
+        kwargs['NextToken'] = results['NextToken']
+
+
+def build_union_chunks(queries, custom_configs):
+    """
+    Split the count queries into chunks of COUNT_UNION_CHUNK_SIZE tables.
+    Tables allowed a full scan are chunked apart, so the pre-flight check
+    of a union query applies the same partition rule to all its tables.
+    """
+    chunks = []
     
-    if len(rows) > 1:
-        return int(rows[1]['Data'][0]['VarCharValue'])
+    for allow_full_scan in (False, True):
+        items = [
+            (report_name, query) for report_name, query in queries.items()
+            if custom_configs[report_name].get('allow_full_scan', False) == allow_full_scan
+        ]
+        chunks.extend(
+            dict(items[start:start + COUNT_UNION_CHUNK_SIZE])
+            for start in range(0, len(items), COUNT_UNION_CHUNK_SIZE)
+        )
     
-    return 0
+    return chunks
 
 
-def process_table(report_name, config, date_params):
-    """Process single table: format query and execute count."""
-    query = config['query'].format(**date_params)
-    count = execute_count_query(query, f"athena_results/{report_name}")
+def build_union_guard_config(chunk, custom_configs):
+    """Guard config of a union query: the sum of the table budgets, none if a table has none."""
+    budgets = [
+        custom_configs[report_name].get('max_scanned_bytes', QUERY_MAX_SCANNED_BYTES)
+        for report_name in chunk
+    ]
     
     return {
-        'table_name': report_name,
-        'send_count': count
+        'allow_full_scan': custom_configs[next(iter(chunk))].get('allow_full_scan', False),
+        'max_scanned_bytes': sum(budgets) if all(budgets) else 0
     }
 
 
+def run_union_queries(chunks, deadline):
+    """
+    Execute the counts as one UNION ALL query per chunk of tables.
+    The tables of a failed union query are counted again one query per table.
+    """
+    union_queries = {
+        f"union-{index}": (build_union_query(chunk), f"s3://{ATHENA_RESULTS_BUCKET}/athena_results/_union")
+        for index, chunk in enumerate(chunks)
+    }
+    
+    executions = run_queries(union_queries, DATABASE, WORKGROUP, deadline=deadline, max_concurrency=MAX_WORKERS)
+    
+    counts = {}
+    fallback_queries = {}
+    
+    for index, chunk in enumerate(chunks):
+        execution = executions[f"union-{index}"]
+        
+        if execution['Status']['State'] != 'SUCCEEDED':
+            reason = execution['Status'].get('StateChangeReason', 'Unknown')
+            logger.warning(f"Union query for {list(chunk)} failed: {reason} - falling back to one query per table")
+            fallback_queries.update(chunk)
+            continue
+        
+        # Unreadable results are counted again like a failed union query
+        try:
+            union_counts = read_union_counts(execution['QueryExecutionId'])
+            counts.update({report_name: union_counts[report_name] for report_name in chunk})
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Union query results for {list(chunk)} cannot be read: {e} - falling back to one query per table")
+            fallback_queries.update(chunk)
+    
+    if fallback_queries:
+        counts.update(run_table_queries(fallback_queries, deadline))
+    
+    return counts
+
+
+def guard_count_queries(queries, deadline):
+    """
+    Pre-flight check of the count queries before their execution: partition
+    predicates and max_scanned_bytes budget, from an EXPLAIN (TYPE IO).
+    queries maps a name to (query, guard config).
+    """
+    guard_queries(
+        queries,
+        DATABASE,
+        WORKGROUP,
+        f"s3://{ATHENA_RESULTS_BUCKET}/athena_results/_explain",
+        deadline=deadline,
+        max_concurrency=MAX_WORKERS
+    )
+
+
+def run_count_queries(custom_configs, date_params, deadline):
+    """Format every configured query and execute the counts on Athena."""
+    queries = format_count_queries(custom_configs, date_params)
+    
+    # The queries actually executed are checked: one EXPLAIN per union query
+    if COUNT_EXECUTION_MODE == 'union' and len(queries) > 1:
+        chunks = build_union_chunks(queries, custom_configs)
+        guard_count_queries({
+            f"union-{index}": (build_union_query(chunk), build_union_guard_config(chunk, custom_configs))
+            for index, chunk in enumerate(chunks)
+        }, deadline)
+        counts = run_union_queries(chunks, deadline)
+    else:
+        guard_count_queries({
+            report_name: (query, custom_configs[report_name])
+            for report_name, query in queries.items()
+        }, deadline)
+        counts = run_table_queries(queries, deadline)
+    
+    results = []
+    for report_name in custom_configs:
+        result = {
+            'table_name': report_name,
+            'send_count': counts[report_name]
+        }
+        results.append(result)
+        logger.info(f"Processed {report_name}: {result.get('send_count', 'N/A')}")
+    
+    return results
+
+
 def save_report(report, date_path):
     """Save count report to S3 with date-partitioned path."""
     key = f"datalake_counts/{date_path}/counts.json"
@@ -125,18 +278,7 @@ def process_daily_count(event, context):
     
     custom_configs = fetch_custom_queries()
     
-    results = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(process_table, report_name, config, date_params): report_name
-            for report_name, config in custom_configs.items()
-        }
-        
-        for future in futures:
-            report_name = futures[future]
-            result = future.result()
-            results.append(result)
-            logger.info(f"Processed {report_name}: {result.get('send_count', 'N/A')}")
+    results = run_count_queries(custom_configs, date_params, compute_deadline(context))
     
     report = {
         'tables': [
@@ -0,0 +1,216 @@
+"""Pre-flight query guard: partition predicates and scan-size budget"""
+import json
+import logging
+import math
+import os
+
+import boto3
+
+from athena_runner import run_queries
+
+logger = logging.getLogger()
+
+athena = boto3.client('athena')
+glue = boto3.client('glue')
+
+# Each Lambda package ships its own copy of this module: keep them identical.
+# 'enforce': rejected queries fail, 'warn': violations are logged only, 'off': no check
+QUERY_GUARD_MODE = os.environ.get('QUERY_GUARD_MODE', 'warn')
+# Default scan budget of a query in bytes, overridden by max_scanned_bytes (0: no budget)
+QUERY_MAX_SCANNED_BYTES = int(os.environ.get('QUERY_MAX_SCANNED_BYTES', '0'))
+
+if QUERY_GUARD_MODE not in ('enforce', 'warn', 'off'):
+    raise ValueError(f"Unsupported QUERY_GUARD_MODE: {QUERY_GUARD_MODE}")
+
+# Kept across warm invocations: table partition keys and workgroup cutoffs
+_partition_keys = {}
+_workgroup_cutoffs = {}
+
+
+def build_explain_query(query):
+    """Wrap a query in EXPLAIN (TYPE IO): the tables read, their constraints and size estimates"""
+    query = query.strip().rstrip(';')
+    return f"EXPLAIN (TYPE IO, FORMAT JSON)\n{query}"
+
+
+def read_explain_plan(query_execution_id):
+    """Read the JSON plan of a succeeded EXPLAIN query, returned as one or more text rows"""
+    lines = []
+    kwargs = {'QueryExecutionId': query_execution_id}
+
+    while True:
+        response = athena.get_query_results(**kwargs)
+
+        for row in response['ResultSet']['Rows']:
+            lines.extend(col.get('VarCharValue', '') for col in row['Data'])
+
+        if not response.get('NextToken'):
+            break
+        kwargs['NextToken'] = response['NextToken']
+
+    text = '\n'.join(lines)
+
+    # Skip the column header, if any
+    return json.loads(text[text.index('{'):])
+
+
+def get_partition_keys(database, table):
+    """Partition keys of a Glue table; None when the table cannot be described"""
+    key = (database, table)
+
+    if key not in _partition_keys:
+        try:
+            response = glue.get_table(DatabaseName=database, Name=table)
+            _partition_keys[key] = [column['Name'] for column in response['Table'].get('PartitionKeys', [])]
+        except Exception as e:
+            logger.warning(f"Cannot read partition keys of {database}.{table}: {e}")
+            return None
+
+    return _partition_keys[key]
+
+
+def get_workgroup_cutoff(workgroup):
+    """BytesScannedCutoffPerQuery of the workgroup; None when not set"""
+    if workgroup not in _workgroup_cutoffs:
+        try:
+            response = athena.get_work_group(WorkGroup=workgroup)
+            _workgroup_cutoffs[workgroup] = response['WorkGroup'].get('Configuration', {}).get('BytesScannedCutoffPerQuery')
+        except Exception as e:
+            logger.warning(f"Cannot read the bytes scanned cutoff of workgroup {workgroup}: {e}")
+            return None
+
+    return _workgroup_cutoffs[workgroup]
+
+
+def estimate_scanned_bytes(plan):
+    """Sum the estimated size of the tables read; None when any estimate is unknown"""
+    total = 0
+
+    for table_info in plan.get('inputTableColumnInfos', []):
+        size = table_info.get('estimate', {}).get('outputSizeInBytes')
+
+        # Tables without statistics are estimated as NaN
+        if not isinstance(size, (int, float)) or math.isnan(size):
+            return None
+
+        total += size
+
+    return int(total)
+
+
+def find_unpruned_tables(plan):
+    """List the partitioned tables read without a predicate on any partition key"""
+    unpruned = []
+
+    for table_info in plan.get('inputTableColumnInfos', []):
+        table = table_info['table']
+        schema_table = table.get('schemaTable', {})
+        constraint = table_info.get('constraint', {})
+
+        # Only Glue tables have partition keys to look up
+        if table.get('catalog', 'awsdatacatalog') != 'awsdatacatalog':
+            continue
+
+        # A predicate matching nothing reads no partition
+        if constraint.get('none'):
+            continue
+
+        partition_keys = get_partition_keys(schema_table.get('schema'), schema_table.get('table'))
+        if not partition_keys:
+            continue
+
+        constrained = {column['columnName'] for column in constraint.get('columnConstraints', [])}
+
+        if not constrained.intersection(partition_keys):
+            unpruned.append(f"{schema_table.get('schema')}.{schema_table.get('table')} ({', '.join(partition_keys)})")
+
+    return unpruned
+
+
+def check_plan(name, plan, query_config, workgroup_cutoff):
+    """Return the violations of one query plan"""
+    violations = []
+
+    if not query_config.get('allow_full_scan', False):
+        for table in find_unpruned_tables(plan):
+            violations.append(f"no predicate on the partition keys of {table}")
+
+    budget = query_config.get('max_scanned_bytes', QUERY_MAX_SCANNED_BYTES)
+    estimate = estimate_scanned_bytes(plan)
+
+    if estimate is None:
+        # Athena cancels anything beyond a cutoff within the budget
+        if budget and not (workgroup_cutoff and workgroup_cutoff <= budget):
+            logger.warning(f"Query {name}: scan size cannot be estimated, budget of {budget} bytes not verified")
+        return violations
+
+    logger.info(f"Query {name}: estimated scan of {estimate} bytes")
+
+    if budget and estimate > budget:
+        violations.append(f"estimated scan of {estimate} bytes exceeds max_scanned_bytes {budget}")
+
+    if workgroup_cutoff and estimate > workgroup_cutoff:
+        violations.append(f"estimated scan of {estimate} bytes exceeds the workgroup cutoff {workgroup_cutoff}")
+
+    return violations
+
+
+def check_queries(queries, database, workgroup, output_location, deadline=None, max_concurrency=None):
+    """
+    Run EXPLAIN (TYPE IO) for the given queries and check their plans
+
+    Args:
+        queries: Dict name -> (query, query_config); query_config may set
+            allow_full_scan and max_scanned_bytes
+        output_location: S3 location of the EXPLAIN results
+
+    Returns:
+        Dict name -> list of violations
+    """
+    explain_queries = {
+        name: (build_explain_query(query), output_location)
+        for name, (query, _) in queries.items()
+    }
+    executions = run_queries(explain_queries, database, workgroup, deadline=deadline, max_concurrency=max_concurrency)
+    workgroup_cutoff = get_workgroup_cutoff(workgroup)
+
+    violations = {}
+
+    for name, (_, query_config) in queries.items():
+        execution = executions[name]
+
+        # A plan that cannot be read is no evidence against the query:
+        # its own execution reports the actual error, if any
+        if execution['Status']['State'] != 'SUCCEEDED':
+            reason = execution['Status'].get('StateChangeReason', 'Unknown')
+            logger.warning(f"Query {name}: EXPLAIN failed, plan not checked: {reason}")
+            violations[name] = []
+            continue
+
+        plan = read_explain_plan(execution['QueryExecutionId'])
+        violations[name] = check_plan(name, plan, query_config, workgroup_cutoff)
+
+    return violations
+
+
+def guard_queries(queries, database, workgroup, output_location, deadline=None, max_concurrency=None):
+    """
+    Pre-flight check of the queries, before any full execution
+    Raises ValueError in enforce mode when a query is rejected
+    """
+    if QUERY_GUARD_MODE == 'off':
+        return
+
+    violations = check_queries(queries, database, workgroup, output_location, deadline, max_concurrency)
+    rejected = {name: messages for name, messages in violations.items() if messages}
+
+    if not rejected:
+        return
+
+    details = '; '.join(f"{name}: {', '.join(messages)}" for name, messages in rejected.items())
+
+    if QUERY_GUARD_MODE == 'warn':
+        logger.warning(f"Pre-flight check found issues (not enforced): {details}")
+        return
+
+    raise ValueError(f"Pre-flight check rejected {len(rejected)} queries: {details}")